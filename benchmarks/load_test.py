@@ -0,0 +1,327 @@
+"""
+Load test of the whole service against stand-in dependencies:
+
+    python -m benchmarks.load_test [--requests 2000] [--concurrency 32] [--chats 4] [--messages 5000]
+                                   [--model hashing|real] [--qdrant-url URL] [--output FILE]
+
+The FastAPI app runs in-process against an in-memory Qdrant (or --qdrant-url), with a
+fake chat-manager and a fake process-questions AI service mounted through
+httpx.ASGITransport. It seeds the store through /pattern/import, drives the /pattern
+endpoints, then runs process_messages_from_chat over synthetic chats. Requests/s,
+p50/p95/p99 latency, patterns/s and peak RSS are printed and saved as JSON (by default
+under benchmarks/results/) so runs before and after a change can be compared.
+
+`--model hashing` (the default) replaces the embedding model with a cheap bag-of-words
+hash so the numbers do not depend on model weights being available; use `--model real`
+to include the configured model's encode cost.
+
+Patterns go to a dedicated ``loadtest_user_questions`` collection, never to the
+service's own: with --qdrant-url it is recreated at the start of every run and dropped
+at the end. (It deliberately does not start with ``user_questions_``, which would look
+like a pending alias switch of the real collection.)
+"""
+import os
+
+# Stand-in services only: never talk to the real ones, whatever the environment says.
+os.environ['CHATS_MANAGER_URL'] = 'http://chats-manager/'
+os.environ['CHAT_BOT_SERVICE_URL'] = 'http://chat-bot/'
+# Set before config loads .env (which never overrides): no search-cache version bumps or
+# AI-cache checkpoints for real chat ids in a shared Redis. A redis search cache would
+# have nothing to talk to, so it is measured as the in-memory one.
+os.environ['REDIS_URL'] = ''
+if os.environ.get('SEARCH_CACHE_BACKEND', 'memory') == 'redis':
+    os.environ['SEARCH_CACHE_BACKEND'] = 'memory'
+else:
+    os.environ.setdefault('SEARCH_CACHE_BACKEND', 'memory')
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', '0:load-test')
+
+import argparse
+import asyncio
+import json
+import random
+import resource
+import subprocess
+import time
+import zlib
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+import numpy as np
+from fastapi import FastAPI, Query, Request
+from qdrant_client import AsyncQdrantClient
+
+import external_service
+from celery_app import proccess_chat
+from celery_app.proccess_chat import CHUNK_SIZE
+from config import EMBEDDING_BACKEND, REPLICA_ENABLED, SEARCH_CACHE_BACKEND
+from deps import get_embedding_model
+from main import create_app
+from qdrant_service.base import get_qdrant_client
+from qdrant_service.replica import load_replica
+from qdrant_service.collection import create_collection
+from qdrant_service.service import QdrantService
+from routers import pattern
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+LOAD_TEST_COLLECTION = 'loadtest_user_questions'
+TOPICS = [
+    'delivery', 'refund', 'invoice', 'password', 'discount', 'warranty', 'tracking', 'payment',
+    'subscription', 'account', 'shipping', 'return', 'order', 'size', 'stock', 'contract',
+]
+VERBS = ['change', 'cancel', 'check', 'get', 'pay for', 'update', 'find', 'extend']
+WORDS = [f'{a}{b}' for a in ('ka', 'lo', 'mi', 'ne', 'su', 'ta', 'vo', 'ri') for b in range(250)]
+
+
+class HashingModel:
+    """Offline stand-in for the embedding model: hashed bag of words, normalized."""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def encode(self, texts, convert_to_numpy=True, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else texts
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[i, zlib.crc32(word.encode()) % self.dim] += 1
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        vectors /= norms
+        return vectors[0] if single else vectors
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+
+def synthetic_question(rng: random.Random) -> str:
+    words = ' '.join(rng.sample(WORDS, 5))
+    return f'how to {rng.choice(VERBS)} {rng.choice(TOPICS)} {words}?'
+
+
+def synthetic_chat(size: int, rng: random.Random) -> List[Dict]:
+    # Clients repeat each other, so part of the extracted patterns are duplicates.
+    pool = [synthetic_question(rng) for _ in range(max(size // 4, 1))]
+    messages = []
+    for i in range(size):
+        if rng.random() < 0.4:
+            messages.append({'sender': 'staff', 'message_text': f'you can do it in the {rng.choice(TOPICS)} section'})
+        else:
+            messages.append({'sender': 'client', 'message_text': rng.choice(pool)})
+    return messages
+
+
+def fake_services(chats: Dict[int, List[Dict]], ai_latency: float, patterns_per_chunk: int, stats: Dict) -> FastAPI:
+    """The chat-manager and the process-questions AI service, told apart by URL path."""
+    app = FastAPI()
+
+    @app.get('/message/{chat_id}/get-unprocessed-messages')
+    async def unprocessed(chat_id: int, limit: int = Query(0), cursor: int = Query(0)):
+        messages = chats.get(chat_id, [])
+        if not limit:
+            return messages
+        page = messages[cursor:cursor + limit]
+        return {'items': page, 'next': cursor + limit if cursor + limit < len(messages) else None}
+
+    @app.post('/message/{chat_id}/mark-as-processed')
+    async def mark_as_processed(chat_id: int):
+        stats['marked'] += 1
+        return {'details': 'ok'}
+
+    @app.post('/process-questions')
+    async def process_questions(request: Request):
+        text = (await request.json())['text']
+        stats['ai_calls'] += 1
+        await asyncio.sleep(ai_latency)
+        questions = [line.split(': ', 1)[1] for line in text.splitlines() if line.startswith('client: ')]
+        return {'items': [{'question': q, 'answer': 'see the help section'} for q in questions[:patterns_per_chunk]]}
+
+    return app
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict:
+    values = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(float(np.percentile(values, 50)), 3),
+        'p95_ms': round(float(np.percentile(values, 95)), 3),
+        'p99_ms': round(float(np.percentile(values, 99)), 3),
+    }
+
+
+async def drive(total: int, concurrency: int, call: Callable[[int], Awaitable[bool]]) -> Dict:
+    """Run ``call(i)`` for i in range(total) with ``concurrency`` requests in flight."""
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            ok = await call(i)
+            latencies.append(time.perf_counter() - started)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+async def bench_pattern_endpoints(api: httpx.AsyncClient, args, rng: random.Random) -> Dict:
+    seed = '\n'.join(
+        json.dumps({'question': synthetic_question(rng), 'answer': 'seeded answer'}) for _ in range(args.seed)
+    )
+    started = time.perf_counter()
+    report = (await api.post('/pattern/import', content=seed)).json()
+    seeded = {'patterns': report['imported'], 'seconds': round(time.perf_counter() - started, 3)}
+
+    questions = [synthetic_question(rng) for _ in range(max(args.requests, 1))]
+
+    async def add(i: int) -> bool:
+        resp = await api.post('/pattern', json={'question': questions[i], 'answer': 'a', 'force_save': False})
+        return resp.status_code in (200, 400)
+
+    async def search(i: int) -> bool:
+        return (await api.get('/pattern', params={'question': questions[i]})).status_code == 200
+
+    async def search_batch(i: int) -> bool:
+        batch = [{'question': questions[(i * 16 + j) % len(questions)], 'limit': 3} for j in range(16)]
+        return (await api.post('/pattern/search-batch', json={'questions': batch})).status_code == 200
+
+    return {
+        'seed': seeded,
+        'add': await drive(max(args.requests // 4, 1), args.concurrency, add),
+        'search': await drive(args.requests, args.concurrency, search),
+        'search_batch': await drive(max(args.requests // 10, 1), args.concurrency, search_batch),
+    }
+
+
+async def bench_process_chat(client: AsyncQdrantClient, model, args, stats: Dict) -> Dict:
+    from celery_app import tasks
+
+    saves: List[asyncio.Task] = []
+    extracted = 0
+
+    def delay(patterns: List[Dict]):
+        nonlocal extracted
+        extracted += len(patterns)
+        saves.append(asyncio.ensure_future(proccess_chat.save_q_a_patterns_batch(patterns, client, model)))
+
+    tasks.save_patterns.delay = delay
+    before = (await client.count(QdrantService.COLLECTION_NAME)).count
+    started = time.perf_counter()
+    await asyncio.gather(*(proccess_chat.process_messages_from_chat(chat_id) for chat_id in range(1, args.chats + 1)))
+    await asyncio.gather(*saves)
+    elapsed = time.perf_counter() - started
+    saved = (await client.count(QdrantService.COLLECTION_NAME)).count - before
+    return {
+        'chats': args.chats,
+        'messages': args.chats * args.messages,
+        'chunks': stats['ai_calls'],
+        'chats_marked_processed': stats['marked'],
+        'patterns_extracted': extracted,
+        'patterns_saved': saved,
+        'seconds': round(elapsed, 3),
+        'messages_per_second': round(args.chats * args.messages / elapsed, 1),
+        'patterns_per_second': round(extracted / elapsed, 1),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ''
+
+
+async def run(args) -> Dict:
+    rng = random.Random(args.random_seed)
+    # Progress messages would otherwise go to Redis and Telegram.
+    async def notify(text, key=None):
+        pass
+
+    proccess_chat.notify = pattern.notify = notify
+
+    if args.model == 'real':
+        from qdrant_service.base import get_model
+        model = get_model()
+    else:
+        model = HashingModel()
+    client = AsyncQdrantClient(url=args.qdrant_url) if args.qdrant_url else AsyncQdrantClient(location=':memory:')
+    # Hashing vectors must never land in the real collection, and every run starts empty.
+    QdrantService.COLLECTION_NAME = LOAD_TEST_COLLECTION
+    if await client.collection_exists(LOAD_TEST_COLLECTION):
+        await client.delete_collection(LOAD_TEST_COLLECTION)
+    # Local mode reports a missing collection with ValueError rather than a 404, so create it up front.
+    await create_collection(client, LOAD_TEST_COLLECTION, model.get_sentence_embedding_dimension())
+
+    stats = {'ai_calls': 0, 'marked': 0}
+    chats = {chat_id: synthetic_chat(args.messages, rng) for chat_id in range(1, args.chats + 1)}
+    external_service.set_http_transport(httpx.ASGITransport(app=fake_services(chats, args.ai_latency / 1000, args.patterns_per_chunk, stats)))
+
+    app = create_app()
+
+    async def override_get_qdrant_client():
+        yield client
+
+    app.dependency_overrides[get_qdrant_client] = override_get_qdrant_client
+    app.dependency_overrides[get_embedding_model] = lambda: model
+
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://api', timeout=None) as api:
+            if REPLICA_ENABLED:
+                await load_replica(client, QdrantService.COLLECTION_NAME)
+            endpoints = await bench_pattern_endpoints(api, args, rng)
+        process_chat = await bench_process_chat(client, model, args, stats)
+    finally:
+        await external_service.close_http_client()
+        external_service.set_http_transport(None)
+        await client.delete_collection(LOAD_TEST_COLLECTION)
+        await client.close()
+
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': git_commit(),
+        'config': {
+            **{k: v for k, v in vars(args).items() if k != 'output'},
+            'chunk_size': CHUNK_SIZE,
+            'collection': LOAD_TEST_COLLECTION,
+            'embedding_backend': EMBEDDING_BACKEND if args.model == 'real' else 'hashing',
+            'search_cache_backend': SEARCH_CACHE_BACKEND,
+            'replica_enabled': REPLICA_ENABLED,
+        },
+        'pattern_endpoints': endpoints,
+        'process_chat': process_chat,
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000, help='GET /pattern requests; adds and batches scale from it')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--seed', type=int, default=2000, help='patterns imported before the run')
+    parser.add_argument('--chats', type=int, default=4)
+    parser.add_argument('--messages', type=int, default=5000, help='messages per chat')
+    parser.add_argument('--ai-latency', type=float, default=50, help='fake AI service latency, ms')
+    parser.add_argument('--patterns-per-chunk', type=int, default=3)
+    parser.add_argument('--model', choices=['hashing', 'real'], default='hashing')
+    parser.add_argument('--qdrant-url', help=f'use this Qdrant instead of an in-memory one (in a {LOAD_TEST_COLLECTION} collection)')
+    parser.add_argument('--random-seed', type=int, default=0)
+    parser.add_argument('--output', type=Path)
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    output = args.output or RESULTS_DIR / f'load-{time.strftime("%Y%m%d-%H%M%S")}.json'
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    print(json.dumps(result, indent=2))
+    print(f'saved to {output}')
+
+
+if __name__ == '__main__':
+    main()
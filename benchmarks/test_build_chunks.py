@@ -0,0 +1,34 @@
+import random
+
+import pytest
+
+from celery_app.proccess_chat import ChunkBuilder, CHUNK_SIZE
+
+
+def synthetic_chat(size: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [
+        {
+            "sender": "staff" if rng.random() < 0.4 else "client",
+            "message_text": "x" * rng.randint(5, 300),
+        }
+        for _ in range(size)
+    ]
+
+
+def chunk_like_process_messages_from_chat(messages, chunk_size: int):
+    # The loop process_messages_from_chat runs over every fetched page.
+    builder = ChunkBuilder(chunk_size)
+    chunks = []
+    for msg in messages:
+        chunk = builder.add(msg)
+        if chunk is not None:
+            chunks.append(chunk)
+    return chunks + builder.finish()
+
+
+@pytest.mark.parametrize("size", [1_000, 100_000, 1_000_000], ids=["1k", "100k", "1M"])
+def test_chunk_builder(benchmark, size):
+    messages = synthetic_chat(size)
+    chunks = benchmark(chunk_like_process_messages_from_chat, messages, CHUNK_SIZE)
+    assert sum(len(c) for c in chunks) == size
@@ -0,0 +1,80 @@
+"""
+Embedding backend comparison. Needs the model weights and, for the ONNX backends,
+`sentence-transformers[onnx]` plus a directory exported with `python -m core.export_model`
+in EMBEDDING_MODEL_DIR:
+
+    EMBEDDING_MODEL_DIR=models/minilm pytest benchmarks/test_embedding_backends.py
+"""
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from config import EMBEDDING_MODEL_DIR
+from core.export_model import embedding_agreement, load_sentences
+from qdrant_service.base import get_model
+
+BACKENDS = ["torch", "onnx", "onnx-int8"]
+MIN_AGREEMENT = {"onnx": 0.999, "onnx-int8": 0.97}
+
+_RSS_SCRIPT = """
+import json, resource, time
+from qdrant_service.base import get_model
+from core.export_model import load_sentences
+sentences = load_sentences() * 8
+model = get_model({backend!r})
+model.encode(sentences[:8])
+start = time.perf_counter()
+model.encode(sentences, batch_size=32)
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "sentences_per_second": len(sentences) / elapsed,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}}))
+"""
+
+
+def _skip_unavailable(backend: str):
+    if backend == "torch":
+        return
+    if importlib.util.find_spec("onnxruntime") is None or importlib.util.find_spec("optimum") is None:
+        pytest.skip("onnx backend needs sentence-transformers[onnx]")
+    if not EMBEDDING_MODEL_DIR:
+        pytest.skip("EMBEDDING_MODEL_DIR with an exported model is not set")
+
+
+@pytest.fixture(scope="module")
+def sentences():
+    return load_sentences()
+
+
+@pytest.fixture(scope="module")
+def reference():
+    return get_model("torch")
+
+
+@pytest.mark.parametrize("backend", ["onnx", "onnx-int8"])
+def test_backend_agrees_with_fp32(backend, reference, sentences):
+    _skip_unavailable(backend)
+    agreement = embedding_agreement(reference, get_model(backend), sentences)
+    assert agreement.min() >= MIN_AGREEMENT[backend]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_encode_throughput(benchmark, backend, sentences):
+    _skip_unavailable(backend)
+    model = get_model(backend)
+    model.encode(sentences[:8])
+    benchmark(model.encode, sentences, batch_size=32)
+    benchmark.extra_info["sentences_per_second"] = len(sentences) / benchmark.stats.stats.mean
+
+    # RSS is only meaningful in a fresh process holding a single backend.
+    result = subprocess.run(
+        [sys.executable, "-c", _RSS_SCRIPT.format(backend=backend)],
+        capture_output=True, text=True, check=True, env=os.environ.copy(),
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    benchmark.extra_info.update(json.loads(result.stdout.strip().splitlines()[-1]))
@@ -0,0 +1,26 @@
+"""
+Smoke run of the load-test harness (python -m benchmarks.load_test) at a tiny size.
+The harness itself is meant to be run directly; see its docstring.
+"""
+import json
+import os
+import subprocess
+import sys
+
+
+def test_load_test_reports_every_stage(tmp_path):
+    output = tmp_path / 'load.json'
+    subprocess.run(
+        [sys.executable, '-m', 'benchmarks.load_test', '--requests', '40', '--seed', '50',
+         '--chats', '1', '--messages', '200', '--ai-latency', '1', '--output', str(output)],
+        capture_output=True, text=True, check=True, env=os.environ.copy(),
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    result = json.loads(output.read_text())
+    for stage in ('add', 'search', 'search_batch'):
+        assert result['pattern_endpoints'][stage]['errors'] == 0
+        assert result['pattern_endpoints'][stage]['p99_ms'] >= result['pattern_endpoints'][stage]['p50_ms']
+    assert result['process_chat']['chats_marked_processed'] == 1
+    assert result['process_chat']['patterns_saved'] > 0
+    assert result['peak_rss_mb'] > 0
+    assert result['config']['collection'] == 'loadtest_user_questions'
@@ -1,8 +1,5 @@
 from celery import Celery
 
-celery_app = Celery('save_lot_data')
+# Tasks are imported by the worker only; the API enqueues them by name with send_task.
+celery_app = Celery('save_lot_data', include=['celery_app.tasks'])
 celery_app.config_from_object('celery_app.celeryconfig')
-
-celery_app.autodiscover_tasks(['celery_app'])
-
-import celery_app.tasks
\ No newline at end of file
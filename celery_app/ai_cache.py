@@ -0,0 +1,86 @@
+"""
+Results of the ``process-questions`` AI service, cached in Redis by chunk text, and a
+per-chat checkpoint of the chunks whose patterns have already been handed to
+``save_patterns``.
+
+A chat is only marked as processed when every chunk succeeded, so after a partial
+failure the next run sees the same messages again. Chunks in the checkpoint are
+skipped outright; other chunks seen before (e.g. by a run whose patterns never got
+queued) reuse the cached extraction instead of calling the AI again. Redis errors
+only cost the cache: the chunk is sent to the AI as if it were new.
+"""
+import hashlib
+import json
+from typing import Dict, Iterable, List, Optional, Set
+
+import redis
+
+from config import AI_CACHE_TTL
+from core.metrics import CACHE_REQUESTS
+from core.redis_client import get_async_redis, redis_enabled
+
+RESULT_KEY = 'ai-cache:result:{digest}'
+COMPLETED_KEY = 'ai-cache:chat:{chat_id}:completed'
+
+
+def enabled() -> bool:
+    return redis_enabled() and AI_CACHE_TTL > 0
+
+
+def chunk_digest(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+async def get_result(digest: str) -> Optional[List[Dict]]:
+    if not enabled():
+        return None
+    try:
+        raw = await get_async_redis().get(RESULT_KEY.format(digest=digest))
+    except redis.RedisError as e:
+        print('ai cache unavailable: ', e)
+        return None
+    CACHE_REQUESTS.labels('ai', 'miss' if raw is None else 'hit').inc()
+    return json.loads(raw) if raw is not None else None
+
+
+async def put_result(digest: str, items: List[Dict]):
+    if not enabled():
+        return
+    try:
+        await get_async_redis().set(RESULT_KEY.format(digest=digest), json.dumps(items, ensure_ascii=False), ex=AI_CACHE_TTL)
+    except redis.RedisError as e:
+        print('ai cache unavailable: ', e)
+
+
+async def completed_chunks(chat_id: int) -> Set[str]:
+    if not enabled():
+        return set()
+    try:
+        members = await get_async_redis().smembers(COMPLETED_KEY.format(chat_id=chat_id))
+    except redis.RedisError as e:
+        print('ai cache unavailable: ', e)
+        return set()
+    return {m.decode() if isinstance(m, bytes) else m for m in members}
+
+
+async def mark_completed(chat_id: int, digests: Iterable[str]):
+    digests = list(digests)
+    if not digests or not enabled():
+        return
+    key = COMPLETED_KEY.format(chat_id=chat_id)
+    try:
+        pipe = get_async_redis().pipeline()
+        pipe.sadd(key, *digests)
+        pipe.expire(key, AI_CACHE_TTL)
+        await pipe.execute()
+    except redis.RedisError as e:
+        print('ai cache unavailable: ', e)
+
+
+async def clear_completed(chat_id: int):
+    if not enabled():
+        return
+    try:
+        await get_async_redis().delete(COMPLETED_KEY.format(chat_id=chat_id))
+    except redis.RedisError as e:
+        print('ai cache unavailable: ', e)
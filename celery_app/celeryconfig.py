@@ -1,7 +1,17 @@
 from celery.schedules import crontab
 from dotenv import load_dotenv
+from kombu import Queue
 
-from config import REDIS_URL
+from config import (
+    REDIS_URL,
+    NOTIFY_FLUSH_INTERVAL,
+    CELERY_IO_CONCURRENCY,
+    CELERY_IO_PREFETCH,
+    CELERY_EMBED_CONCURRENCY,
+    CELERY_EMBED_PREFETCH,
+    CELERY_NOTIFY_CONCURRENCY,
+    CELERY_NOTIFY_PREFETCH,
+)
 
 load_dotenv()
 
@@ -9,12 +19,45 @@ beat_schedule = {
     'data-collection': {
         'task': 'celery_app.tasks.daily_task',
         'schedule': crontab(hour=5, minute=30),
-    }
+    },
+    'flush-notifications': {
+        'task': 'celery_app.tasks.flush_notification_digest',
+        'schedule': NOTIFY_FLUSH_INTERVAL,
+    },
 }
 
 broker_url = REDIS_URL
 timezone = 'UTC'
 task_track_started = True
 
+# io: chat-manager / AI service calls, embed: CPU-bound encoding + Qdrant writes,
+# notify: Telegram digests. Run dedicated workers with e.g. `celery -A celery_app worker -Q embed`;
+# a worker started without -Q consumes all three.
+IO_QUEUE = 'io'
+EMBED_QUEUE = 'embed'
+NOTIFY_QUEUE = 'notify'
 
+task_queues = (
+    Queue(IO_QUEUE),
+    Queue(EMBED_QUEUE),
+    Queue(NOTIFY_QUEUE),
+)
+task_default_queue = IO_QUEUE
+task_routes = {
+    'celery_app.tasks.daily_task': {'queue': IO_QUEUE},
+    'celery_app.tasks.process_chat': {'queue': IO_QUEUE},
+    'celery_app.tasks.save_pattern': {'queue': EMBED_QUEUE},
+    'celery_app.tasks.save_patterns': {'queue': EMBED_QUEUE},
+    'celery_app.tasks.reindex_patterns': {'queue': EMBED_QUEUE},
+    'celery_app.tasks.send_notification': {'queue': NOTIFY_QUEUE},
+    'celery_app.tasks.flush_notification_digest': {'queue': NOTIFY_QUEUE},
+}
 
+# Applied by celery_app.tasks.configure_worker to a worker consuming a single queue,
+# unless --concurrency/--prefetch-multiplier are given on the command line (a
+# --prefetch-multiplier equal to worker_prefetch_multiplier can't be told from no flag).
+queue_worker_settings = {
+    IO_QUEUE: {'concurrency': CELERY_IO_CONCURRENCY, 'prefetch_multiplier': CELERY_IO_PREFETCH},
+    EMBED_QUEUE: {'concurrency': CELERY_EMBED_CONCURRENCY, 'prefetch_multiplier': CELERY_EMBED_PREFETCH},
+    NOTIFY_QUEUE: {'concurrency': CELERY_NOTIFY_CONCURRENCY, 'prefetch_multiplier': CELERY_NOTIFY_PREFETCH},
+}
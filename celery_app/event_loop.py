@@ -0,0 +1,70 @@
+import asyncio
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Awaitable, Coroutine, Optional, TypeVar
+
+T = TypeVar("T")
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_thread: Optional[threading.Thread] = None
+_lock = threading.Lock()
+
+
+def start_loop() -> asyncio.AbstractEventLoop:
+    """
+    Start the worker process' persistent event loop in a daemon thread.
+
+    Tasks submit coroutines to it instead of calling ``asyncio.run``, so pooled
+    HTTP/Qdrant connections, the embedding engine and any background coroutines
+    outlive a single task and keep running between tasks.
+    """
+    global _loop, _thread
+    with _lock:
+        if _loop is not None and _thread is not None and _thread.is_alive():
+            return _loop
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def serve():
+            asyncio.set_event_loop(loop)
+            loop.call_soon(ready.set)
+            loop.run_forever()
+
+        _thread = threading.Thread(target=serve, name='worker-event-loop', daemon=True)
+        _thread.start()
+        ready.wait()
+        _loop = loop
+        return loop
+
+
+def run_async(coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+    """Run ``coro`` on the persistent loop and block the calling task until it finishes."""
+    loop = start_loop()
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    try:
+        return future.result(timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        raise
+
+
+def stop_loop(*cleanup: Coroutine, timeout: float = 10):
+    """Run the ``cleanup`` coroutines, then stop and close the loop."""
+    global _loop, _thread
+    with _lock:
+        loop, thread = _loop, _thread
+        _loop, _thread = None, None
+    if loop is None:
+        for coro in cleanup:
+            coro.close()
+        return
+    for coro in cleanup:
+        try:
+            asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+        except Exception as e:
+            print('worker loop cleanup failed: ', e)
+    loop.call_soon_threadsafe(loop.stop)
+    if thread is not None:
+        thread.join(timeout)
+    if not loop.is_running():
+        loop.close()
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import json
+import time
+from typing import List, Dict, Optional, TYPE_CHECKING
+
+import redis
+
+from config import ADMIN_TG_ID, NOTIFY_MAX_EVENTS_PER_FLUSH, NOTIFY_MAX_MESSAGES_PER_FLUSH, NOTIFY_MESSAGE_INTERVAL
+from core.redis_client import get_async_redis, get_redis, redis_enabled
+
+if TYPE_CHECKING:
+    from telebot import TeleBot
+
+NOTIFICATIONS_KEY = 'notifications:pending'
+FLUSH_LOCK_KEY = 'notifications:flush-lock'
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+
+async def notify(text: str, key: Optional[str] = None):
+    """
+    Buffer a notification for the next digest instead of sending it right away.
+
+    Events sharing a ``key`` (e.g. progress of one chat) are coalesced so that only the
+    latest one is delivered. Without REDIS_URL notifications are off and this is a no-op.
+    """
+    if not redis_enabled():
+        return
+    try:
+        await get_async_redis().rpush(NOTIFICATIONS_KEY, json.dumps({'text': text, 'key': key}))
+    except redis.RedisError as e:
+        print('notification dropped: ', e, text)
+
+
+def coalesce(events: List[Dict]) -> List[str]:
+    """Keep the latest event per key and fold repeated texts into one line with a counter."""
+    latest: Dict[str, int] = {}
+    for i, event in enumerate(events):
+        if event.get('key'):
+            latest[event['key']] = i
+    lines: Dict[str, int] = {}
+    for i, event in enumerate(events):
+        if event.get('key') and latest[event['key']] != i:
+            continue
+        lines[event['text']] = lines.get(event['text'], 0) + 1
+    return [text if count == 1 else f'{text} ×{count}' for text, count in lines.items()]
+
+
+def build_digests(lines: List[str], limit: int = TELEGRAM_MESSAGE_LIMIT) -> List[List[str]]:
+    """Group lines into messages that fit Telegram's length limit once joined with newlines."""
+    digests: List[List[str]] = []
+    current: List[str] = []
+    length = 0
+    for line in lines:
+        line = line[:limit]
+        if current and length + 1 + len(line) > limit:
+            digests.append(current)
+            current, length = [], 0
+        length += len(line) + (1 if current else 0)
+        current.append(line)
+    if current:
+        digests.append(current)
+    return digests
+
+
+def _take_events(client: redis.Redis, count: int) -> List[Dict]:
+    pipe = client.pipeline()
+    pipe.lrange(NOTIFICATIONS_KEY, 0, count - 1)
+    pipe.ltrim(NOTIFICATIONS_KEY, count, -1)
+    raw, _ = pipe.execute()
+    return [json.loads(item) for item in raw]
+
+
+def _return_lines(client: redis.Redis, lines: List[str]):
+    # Unsent digest lines go back to the head of the queue for the next flush.
+    if lines:
+        client.lpush(NOTIFICATIONS_KEY, *[json.dumps({'text': line, 'key': None}) for line in reversed(lines)])
+
+
+def flush_notifications(bot: TeleBot) -> int:
+    """
+    Drain buffered events into rate-limited digest messages. Only one flush runs at a
+    time across all workers; returns the number of messages sent.
+    """
+    # Imported here so the API can buffer notifications without loading telebot.
+    from telebot.apihelper import ApiTelegramException
+
+    client = get_redis()
+    lock = client.lock(FLUSH_LOCK_KEY, timeout=300, blocking=False)
+    if not lock.acquire():
+        return 0
+    try:
+        events = _take_events(client, NOTIFY_MAX_EVENTS_PER_FLUSH)
+        if not events:
+            return 0
+        digests = build_digests(coalesce(events))
+        sent = 0
+        for i, digest in enumerate(digests):
+            if sent >= NOTIFY_MAX_MESSAGES_PER_FLUSH:
+                _return_lines(client, [line for rest in digests[i:] for line in rest])
+                break
+            try:
+                bot.send_message(chat_id=ADMIN_TG_ID, text='\n'.join(digest), parse_mode='HTML')
+            except ApiTelegramException as e:
+                print('telegram rejected digest: ', e)
+                if e.error_code == 429:
+                    _return_lines(client, [line for rest in digests[i:] for line in rest])
+                    break
+                continue
+            except Exception as e:
+                # Network errors and timeouts: keep the drained events for the next flush.
+                print('digest not sent: ', e)
+                _return_lines(client, [line for rest in digests[i:] for line in rest])
+                break
+            sent += 1
+            if i + 1 < len(digests):
+                time.sleep(NOTIFY_MESSAGE_INTERVAL)
+        return sent
+    finally:
+        lock.release()
@@ -1,98 +1,239 @@
-from typing import List, Dict
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import List, Dict, Optional, AsyncIterator, TYPE_CHECKING
 
 from qdrant_client import AsyncQdrantClient
-from sentence_transformers import SentenceTransformer
 
-from config import CHAT_BOT_SERVICE_URL
+from config import (
+    CHAT_BOT_SERVICE_URL,
+    HTTP_AI_TIMEOUT,
+    DUPLICATE_SCORE_THRESHOLD,
+    SAVE_BATCH_SIZE,
+    AI_CONCURRENCY,
+    MESSAGES_PAGE_SIZE,
+)
+from celery_app import ai_cache
+from celery_app.notifications import notify
+from core.metrics import CHUNKING_SECONDS, CHAT_CHUNKS, CHAT_PATTERNS
 from external_service import make_request
 from qdrant_service.service import QdrantService
-from qdrant_service.types import QuestionLimit, QuestionAnswer
+from qdrant_service.types import QuestionAnswer
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
 
 CHUNK_SIZE = 1300
 
 
 async def process_chats():
-    from celery_app.tasks import process_chat, send_notification
+    from celery_app.tasks import process_chat
     chat_list = await make_request('data-for-processing/get-chats-ids')
     if chat_list['status'] != 200:
-        send_notification.delay(f"<b>process_chats</b>: ❌ status={chat_list['status']}")
+        await notify(f"<b>process_chats</b>: ❌ status={chat_list['status']}")
         return
     ids = chat_list.get('body') or []
     if not ids:
-        send_notification.delay("<b>process_chats</b>: 💤 <i>Нет чатов для обработки</i>")
+        await notify("<b>process_chats</b>: 💤 <i>Нет чатов для обработки</i>")
         return
     for chat_id in ids:
         process_chat.delay(chat_id)
-    send_notification.delay(f"<b>process_chats</b>: 🚀 Запущено задач: <b>{len(ids)}</b>")
+    await notify(f"<b>process_chats</b>: 🚀 Запущено задач: <b>{len(ids)}</b>")
+
+
+class MessagesFetchError(Exception):
+    def __init__(self, status: int):
+        super().__init__(f'status={status}')
+        self.status = status
+
+
+async def iter_unprocessed_messages(chat_id: int, page_size: Optional[int] = None) -> AsyncIterator[List[Dict]]:
+    """
+    Yield the chat's unprocessed messages page by page.
+
+    With ``page_size`` > 0 pages are requested with ``limit``/``cursor`` query params and
+    the chat manager answers ``{"items": [...], "next": cursor}``; a plain list body
+    (``page_size`` == 0 or a server without pagination) is the whole chat at once.
+    """
+    if page_size is None:
+        page_size = MESSAGES_PAGE_SIZE
+    cursor = None
+    while True:
+        params = None
+        if page_size > 0:
+            params = {'limit': page_size}
+            if cursor is not None:
+                params['cursor'] = cursor
+        response = await make_request(f'message/{chat_id}/get-unprocessed-messages', params=params)
+        if response['status'] != 200:
+            raise MessagesFetchError(response['status'])
+        body = response.get('body') or []
+        if isinstance(body, list):
+            yield body
+            return
+        yield body.get('items') or []
+        cursor = body.get('next')
+        if cursor is None:
+            return
 
 
 async def process_messages_from_chat(chat_id: int):
-    from celery_app.tasks import save_pattern, send_notification
-    send_notification.delay(f"<b>chat {chat_id}</b>: 🔎 Старт обработки")
-    messages = await make_request(f'message/{chat_id}/get-unprocessed-messages')
-    if messages['status'] != 200:
-        send_notification.delay(f"<b>chat {chat_id}</b>: ❌ status={messages['status']}")
+    from celery_app.tasks import save_patterns
+    await notify(f"<b>chat {chat_id}</b>: 🔎 Старт обработки")
+    semaphore = asyncio.Semaphore(AI_CONCURRENCY)
+    analyses: List[asyncio.Task] = []
+    # Chunks whose patterns a previous, partially failed run already queued for saving.
+    completed = await ai_cache.completed_chunks(chat_id)
+    skipped_chunks = 0
+
+    async def analyze_chunk(i: int, text: str, digest: str):
+        try:
+            response = await ai_cache.get_result(digest)
+            if response is None:
+                response = await process_using_ai(text)
+                if response is not None:
+                    await ai_cache.put_result(digest, response)
+        finally:
+            semaphore.release()
+        if response is not None:
+            await notify(f"<b>chat {chat_id}</b>: 🧩 Чанк {i} обработан", key=f'chat:{chat_id}:progress')
+        return digest, response
+
+    async def schedule(chunk: List[Dict]):
+        nonlocal skipped_chunks
+        text = messages_to_text(chunk)
+        digest = ai_cache.chunk_digest(text)
+        if digest in completed:
+            skipped_chunks += 1
+            return
+        # Waiting for a free slot before reading further keeps at most AI_CONCURRENCY
+        # chunks (plus the current page) in memory, whatever the size of the chat.
+        await semaphore.acquire()
+        analyses.append(asyncio.create_task(analyze_chunk(len(analyses) + 1, text, digest)))
+
+    builder = ChunkBuilder(CHUNK_SIZE)
+    held: List[List[Dict]] = []
+    total_messages = 0
+    chunking_time = 0.0
+    fetch_status = None
+    try:
+        async for page in iter_unprocessed_messages(chat_id):
+            started = time.perf_counter()
+            for msg in page:
+                total_messages += 1
+                chunk = builder.add(msg)
+                if chunk is not None:
+                    held.append(chunk)
+            chunking_time += time.perf_counter() - started
+            if total_messages > 3:
+                for chunk in held:
+                    await schedule(chunk)
+                held = []
+    except MessagesFetchError as e:
+        fetch_status = e.status
+
+    if fetch_status is None:
+        if total_messages <= 3:
+            await notify(f'<b>chat {chat_id}</b>: Слишком мало сообщений в чате ❌')
+            return
+        started = time.perf_counter()
+        held += builder.finish()
+        CHUNKING_SECONDS.observe(chunking_time + time.perf_counter() - started)
+        for chunk in held:
+            await schedule(chunk)
+
+    results = await asyncio.gather(*analyses, return_exceptions=True)
+    total_chunks = len(results) + skipped_chunks
+    total_patterns = 0
+    failed_chunks = 0
+    pending: List[Dict] = []
+    pending_digests: List[str] = []
+    for result in results:
+        if isinstance(result, BaseException):
+            print(result)
+            failed_chunks += 1
+            continue
+        digest, response = result
+        if response is None:
+            failed_chunks += 1
+            continue
+        pending_digests.append(digest)
+        for pattern in response:
+            pending.append({
+                'question': pattern['question'],
+                'answer': pattern['answer'],
+                'chat_id': str(chat_id),
+                'language': pattern.get('language'),
+            })
+            total_patterns += 1
+        if len(pending) >= SAVE_BATCH_SIZE:
+            save_patterns.delay(pending)
+            await ai_cache.mark_completed(chat_id, pending_digests)
+            pending, pending_digests = [], []
+    if pending:
+        save_patterns.delay(pending)
+    await ai_cache.mark_completed(chat_id, pending_digests)
+    CHAT_CHUNKS.observe(total_chunks)
+    CHAT_PATTERNS.observe(total_patterns)
+    if fetch_status is not None:
+        await notify(f"<b>chat {chat_id}</b>: ❌ status={fetch_status}")
         return
-    body = messages.get('body') or []
-    total_messages = len(body)
-    if total_messages <= 3:
-        send_notification.delay(f'<b>chat {chat_id}</b>: Слишком мало сообщений в чате ❌')
+    if failed_chunks:
+        await notify(f"<b>chat {chat_id}</b>: ❌ Не обработано чанков: <b>{failed_chunks}/{total_chunks}</b>, чат не отмечен как обработанный")
         return
-    chunks = build_chunks(body, CHUNK_SIZE)
-    total_chunks = len(chunks)
-    total_patterns = 0
-    for i, chunk in enumerate(chunks, 1):
-        text = messages_to_text(chunk)
-        response = await process_using_ai(text)
-        if response:
-            for pattern in response:
-                save_pattern.delay(pattern['question'], pattern['answer'])
-                total_patterns += 1
-        send_notification.delay(f"<b>chat {chat_id}</b>: 🧩 Чанк {i}/{total_chunks} обработан")
     await make_request(f'message/{chat_id}/mark-as-processed', method='POST')
-    send_notification.delay(f"<b>chat {chat_id}</b>: ✅ Сообщений: <b>{total_messages}</b>, чанков: <b>{total_chunks}</b>, сохранённых паттернов: <b>{total_patterns}</b>")
+    await ai_cache.clear_completed(chat_id)
+    resumed = f" (из прошлого запуска: <b>{skipped_chunks}</b>)" if skipped_chunks else ""
+    await notify(f"<b>chat {chat_id}</b>: ✅ Сообщений: <b>{total_messages}</b>, чанков: <b>{total_chunks}</b>{resumed}, сохранённых паттернов: <b>{total_patterns}</b>")
+
+
+class ChunkBuilder:
+    """
+    Incremental chunker: messages are fed one at a time and a chunk is returned as soon
+    as it is complete (at least ``chunk_size`` characters and ending with a staff
+    message). ``finish`` splits the remaining tail after its last staff message.
+    """
+
+    def __init__(self, chunk_size: int):
+        self.chunk_size = chunk_size
+        self._current: List[Dict] = []
+        self._length = 0
+
+    def add(self, msg: Dict) -> Optional[List[Dict]]:
+        self._current.append(msg)
+        self._length += _message_length(msg)
+        if self._length >= self.chunk_size and msg["sender"].lower() == "staff":
+            chunk, self._current, self._length = self._current, [], 0
+            return chunk
+        return None
+
+    def finish(self) -> List[List[Dict]]:
+        current, self._current, self._length = self._current, [], 0
+        if not current:
+            return []
+        last_staff = len(current) - 1
+        while last_staff >= 0 and current[last_staff]["sender"].lower() != "staff":
+            last_staff -= 1
+        if last_staff in (-1, len(current) - 1):
+            return [current]
+        return [current[:last_staff + 1], current[last_staff + 1:]]
+
+
+def _message_length(msg: Dict) -> int:
+    # Length of the f'{sender}: {message_text}\n' line without building the string.
+    text = msg["message_text"]
+    return len(msg["sender"]) + len(text if isinstance(text, str) else str(text)) + 3
 
 
 def build_chunks(messages: List[Dict], chunk_size: int) -> List[List[Dict]]:
-    chunks: List[List[Dict]] = []
-    current: List[Dict] = []
-    current_len = 0
-    for msg in messages:
-        seg = f'{msg["sender"]}: {msg["message_text"]}\n'
-        current.append(msg)
-        current_len += len(seg)
-        if current_len >= chunk_size and msg["sender"].lower() == "staff":
-            chunks.append(current)
-            current = []
-            current_len = 0
-    if current:
-        if current[-1]["sender"].lower() == "staff":
-            chunks.append(current)
-        else:
-            last_staff_index = -1
-            for idx in range(len(current) - 1, -1, -1):
-                if current[idx]["sender"].lower() == "staff":
-                    last_staff_index = idx
-                    break
-            if last_staff_index != -1:
-                chunks.append(current[:last_staff_index + 1])
-                remaining = current[last_staff_index + 1:]
-                if remaining:
-                    if remaining[-1]["sender"].lower() == "staff":
-                        chunks.append(remaining)
-                    else:
-                        for msg in messages[messages.index(remaining[-1]) + 1:]:
-                            remaining.append(msg)
-                            if msg["sender"].lower() == "staff":
-                                break
-                        chunks.append(remaining)
-            else:
-                for msg in messages[messages.index(current[0]):]:
-                    current.append(msg)
-                    if msg["sender"].lower() == "staff":
-                        break
-                chunks.append(current)
-    return chunks
+    """
+    Split messages into chunks of at least ``chunk_size`` characters that end with a
+    staff message. The incomplete tail is split after its last staff message.
+    """
+    builder = ChunkBuilder(chunk_size)
+    chunks = [chunk for chunk in map(builder.add, messages) if chunk is not None]
+    return chunks + builder.finish()
 
 
 def messages_to_text(messages: List[Dict]) -> str:
@@ -100,26 +241,31 @@ def messages_to_text(messages: List[Dict]) -> str:
 
 
 async def process_using_ai(text: str):
-    from celery_app.tasks import send_notification
-    response = await make_request(base_url=CHAT_BOT_SERVICE_URL, method='POST', url='process-questions', data={'text': text})
+    response = await make_request(base_url=CHAT_BOT_SERVICE_URL, method='POST', url='process-questions', data={'text': text}, timeout=HTTP_AI_TIMEOUT)
     if response['status'] == 200:
-        data = response['body'].get('items')
-        size = len(data) if data else 0
-        send_notification.delay(f"<b>AI</b>: 🧠 Найдено Q/A: <b>{size}</b>")
+        data = response['body'].get('items') or []
+        await notify(f"<b>AI</b>: 🧠 Найдено Q/A: <b>{len(data)}</b>")
         return data
-    send_notification.delay(f"<b>AI</b>: ❌ status={response['status']}")
+    await notify(f"<b>AI</b>: ❌ status={response['status']}")
     return None
 
 
 async def save_q_a_patterns(question: str, answer: str, client: AsyncQdrantClient, model: SentenceTransformer):
-    from celery_app.tasks import send_notification
     service = QdrantService(client, model)
-    response = await service.search_similar_questions(QuestionLimit(question=question))
-    top_result = None
-    if response:
-        top_result = response[0]
-        if top_result.score >= 0.68:
-            send_notification.delay(f"<b>Qdrant</b>: ⏭️ Пропущено (score={top_result.score:.2f} ≥ 0.68)")
-            return
+    duplicate = await service.find_duplicate(question, DUPLICATE_SCORE_THRESHOLD)
+    if duplicate is not None:
+        await notify(f"<b>Qdrant</b>: ⏭️ Пропущено (score={duplicate.score:.2f} ≥ {DUPLICATE_SCORE_THRESHOLD})")
+        return
     await service.save_question_answer_pattern(QuestionAnswer(question=question, answer=answer))
-    send_notification.delay(f"<b>Qdrant</b>: 💾 Сохранено (score={f'{top_result.score:.2f}' if top_result else '?' })")
+    await notify(f"<b>Qdrant</b>: 💾 Сохранено (score &lt; {DUPLICATE_SCORE_THRESHOLD})")
+
+
+
+async def save_q_a_patterns_batch(patterns: List[Dict], client: AsyncQdrantClient, model: SentenceTransformer):
+    service = QdrantService(client, model)
+    items = [
+        QuestionAnswer(question=p['question'], answer=p['answer'], chat_id=p.get('chat_id'), language=p.get('language'))
+        for p in patterns
+    ]
+    result = await service.save_question_answer_patterns(items, DUPLICATE_SCORE_THRESHOLD)
+    await notify(f"<b>Qdrant</b>: 💾 Сохранено: <b>{len(result.saved)}</b>, ⏭️ пропущено: <b>{len(result.skipped)}</b>, 🔁 дубликатов в пакете: <b>{len(result.merged)}</b>")
@@ -1,41 +1,110 @@
-import asyncio
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING
 
 from celery import signals
-from qdrant_client import AsyncQdrantClient
-from sentence_transformers import SentenceTransformer
 from telebot import TeleBot
 from celery_app import celery_app
-from celery_app.proccess_chat import process_messages_from_chat, save_q_a_patterns, process_chats
-from config import QDRANT_URL, TELEGRAM_BOT_TOKEN, ADMIN_TG_ID
-from qdrant_service.base import get_model
+from celery_app.celeryconfig import EMBED_QUEUE
+from celery_app.event_loop import start_loop, run_async, stop_loop
+from celery_app.notifications import flush_notifications, notify
+from celery_app.proccess_chat import process_messages_from_chat, save_q_a_patterns, save_q_a_patterns_batch, process_chats
+from config import TELEGRAM_BOT_TOKEN, ADMIN_TG_ID, CELERY_METRICS_PORT
+from core.metrics import start_exporter, mark_process_dead
+from core.redis_client import get_redis
+from external_service import close_http_client
+from qdrant_service.base import get_model, init_qdrant_client, close_qdrant_client
+from qdrant_service.reindex import RedisCheckpoint, reindex_collection
+from qdrant_service.service import QdrantService, prepare_collection
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
 
 MODEL: SentenceTransformer | None = None
+WORKER_QUEUES_ENV = 'CELERY_WORKER_QUEUES'
 bot = TeleBot(TELEGRAM_BOT_TOKEN)
 
+@signals.celeryd_init.connect
+def configure_worker(conf=None, options=None, instance=None, **kwargs):
+    queues = options.get('queues') or []
+    if isinstance(queues, str):
+        queues = queues.split(',')
+    queues = [q.strip() for q in queues if q.strip()]
+    # Pool processes inherit the environment, so preload_resources can tell what they serve.
+    os.environ[WORKER_QUEUES_ENV] = ','.join(queues)
+    if CELERY_METRICS_PORT:
+        start_exporter(CELERY_METRICS_PORT)
+    if len(queues) != 1 or queues[0] not in conf.queue_worker_settings:
+        return
+    settings = conf.queue_worker_settings[queues[0]]
+    if not isinstance(options.get('concurrency'), int):
+        conf.worker_concurrency = settings['concurrency']
+    # The CLI fills a missing --prefetch-multiplier in with the configured default and the
+    # worker prefers that argument over conf, so the flag counts as given only when it
+    # differs from the default, and the queue's value is put on the worker once it is set up.
+    if options.get('prefetch_multiplier') in (None, conf.worker_prefetch_multiplier):
+        conf.worker_prefetch_multiplier = settings['prefetch_multiplier']
+        if instance is not None:
+            instance.queue_prefetch_multiplier = settings['prefetch_multiplier']
+
+@signals.worker_init.connect
+def apply_queue_prefetch(sender=None, **kwargs):
+    multiplier = getattr(sender, 'queue_prefetch_multiplier', None)
+    if multiplier is not None:
+        sender.prefetch_multiplier = multiplier
+
+def serves_embeddings() -> bool:
+    queues = os.getenv(WORKER_QUEUES_ENV, '')
+    return not queues or EMBED_QUEUE in queues.split(',')
+
+def get_worker_model() -> SentenceTransformer:
+    global MODEL
+    if MODEL is None:
+        MODEL = get_model()
+    return MODEL
+
 @signals.worker_process_init.connect
 def preload_resources(**kwargs):
-    global MODEL
-    MODEL = get_model()
+    start_loop()
+    if serves_embeddings():
+        run_async(prepare_collection(init_qdrant_client(), get_worker_model()))
+
+@signals.worker_process_shutdown.connect
+def release_resources(**kwargs):
+    stop_loop(close_qdrant_client(), close_http_client())
+    mark_process_dead(os.getpid())
 
 @celery_app.task(max_retries=0)
 def process_chat(chat_id: int):
-    asyncio.run(process_messages_from_chat(chat_id))
+    run_async(process_messages_from_chat(chat_id))
 
 @celery_app.task()
 def daily_task():
-    asyncio.run(process_chats())
+    run_async(process_chats())
 
 @celery_app.task(max_retries=0)
 def save_pattern(question: str, answer: str):
-    client = AsyncQdrantClient(url=QDRANT_URL)
-    asyncio.run(save_q_a_patterns(question, answer, client, MODEL))
+    run_async(save_q_a_patterns(question, answer, init_qdrant_client(), get_worker_model()))
+
+@celery_app.task(max_retries=0)
+def save_patterns(patterns: list[dict]):
+    run_async(save_q_a_patterns_batch(patterns, init_qdrant_client(), get_worker_model()))
+
+@celery_app.task(max_retries=0)
+def reindex_patterns(model_name: str, drop_old: bool = False):
+    name = QdrantService.COLLECTION_NAME
+    # Loads the new model next to the worker's own; run it on an embed worker with memory to spare.
+    target = run_async(reindex_collection(
+        init_qdrant_client(), get_model(model_name=model_name), name, RedisCheckpoint(get_redis(), name),
+        drop_old=drop_old, model_name=model_name,
+    ))
+    run_async(notify(f"<b>Qdrant</b>: 🔁 Переиндексация <b>{model_name}</b> завершена, {name} → {target}"))
 
 @celery_app.task()
 def send_notification(text: str):
     bot.send_message(chat_id=ADMIN_TG_ID, text=text, parse_mode='HTML')
 
-
-
-
-
-
+@celery_app.task(ignore_result=True)
+def flush_notification_digest():
+    flush_notifications(bot)
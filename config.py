@@ -17,10 +17,113 @@ DB_PASSWORD = os.getenv("BOT_DB_PASS")
 DB_NAME = os.getenv("BOT_DB_NAME")
 
 REDIS_URL=os.getenv("REDIS_URL")
+# Seconds a Redis command may block before it fails (and the caller degrades).
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "5"))
 
 TELEGRAM_BOT_TOKEN=os.getenv("TELEGRAM_BOT_TOKEN")
 ADMIN_TG_ID=os.getenv("ADMIN_TG_ID")
 
 CHATS_MANAGER_URL=os.getenv("CHATS_MANAGER_URL")
 CHAT_BOT_SERVICE_URL=os.getenv("CHAT_BOT_SERVICE_URL")
-QDRANT_URL=os.getenv("QDRANT_URL")
\ No newline at end of file
+QDRANT_URL=os.getenv("QDRANT_URL")
+
+EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "32"))
+EMBEDDING_MAX_WAIT_MS = float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5"))
+
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "paraphrase-multilingual-MiniLM-L12-v2")
+
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+EMBEDDING_CACHE_TTL = float(os.getenv("EMBEDDING_CACHE_TTL", "0"))
+
+QDRANT_TIMEOUT = int(os.getenv("QDRANT_TIMEOUT", "30"))
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true"
+QDRANT_POOL_MAX_CONNECTIONS = int(os.getenv("QDRANT_POOL_MAX_CONNECTIONS", "100"))
+QDRANT_POOL_MAX_KEEPALIVE = int(os.getenv("QDRANT_POOL_MAX_KEEPALIVE", "20"))
+QDRANT_POOL_KEEPALIVE_EXPIRY = float(os.getenv("QDRANT_POOL_KEEPALIVE_EXPIRY", "30"))
+
+DUPLICATE_SCORE_THRESHOLD = float(os.getenv("DUPLICATE_SCORE_THRESHOLD", "0.68"))
+SAVE_BATCH_SIZE = int(os.getenv("SAVE_BATCH_SIZE", "256"))
+
+AI_CONCURRENCY = int(os.getenv("AI_CONCURRENCY", "4"))
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+HTTP_AI_TIMEOUT = float(os.getenv("HTTP_AI_TIMEOUT", "120"))
+HTTP_MAX_ATTEMPTS = int(os.getenv("HTTP_MAX_ATTEMPTS", "3"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "10"))
+HTTP_POOL_MAX_CONNECTIONS = int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "50"))
+HTTP_POOL_MAX_KEEPALIVE = int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "20"))
+CIRCUIT_BREAKER_FAILURES = int(os.getenv("CIRCUIT_BREAKER_FAILURES", "5"))
+CIRCUIT_BREAKER_RESET_TIMEOUT = float(os.getenv("CIRCUIT_BREAKER_RESET_TIMEOUT", "30"))
+
+MESSAGES_PAGE_SIZE = int(os.getenv("MESSAGES_PAGE_SIZE", "0"))
+
+NOTIFY_FLUSH_INTERVAL = float(os.getenv("NOTIFY_FLUSH_INTERVAL", "30"))
+NOTIFY_MAX_EVENTS_PER_FLUSH = int(os.getenv("NOTIFY_MAX_EVENTS_PER_FLUSH", "1000"))
+NOTIFY_MAX_MESSAGES_PER_FLUSH = int(os.getenv("NOTIFY_MAX_MESSAGES_PER_FLUSH", "10"))
+NOTIFY_MESSAGE_INTERVAL = float(os.getenv("NOTIFY_MESSAGE_INTERVAL", "1.1"))
+
+CELERY_IO_CONCURRENCY = int(os.getenv("CELERY_IO_CONCURRENCY", "8"))
+CELERY_IO_PREFETCH = int(os.getenv("CELERY_IO_PREFETCH", "4"))
+CELERY_EMBED_CONCURRENCY = int(os.getenv("CELERY_EMBED_CONCURRENCY", "2"))
+CELERY_EMBED_PREFETCH = int(os.getenv("CELERY_EMBED_PREFETCH", "1"))
+CELERY_NOTIFY_CONCURRENCY = int(os.getenv("CELERY_NOTIFY_CONCURRENCY", "1"))
+CELERY_NOTIFY_PREFETCH = int(os.getenv("CELERY_NOTIFY_PREFETCH", "1"))
+
+# torch (fp32 PyTorch), onnx (ONNX Runtime fp32) or onnx-int8 (dynamically quantized ONNX).
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+# Directory produced by `python -m core.export_model` for EMBEDDING_MODEL_NAME; ONNX backends load
+# that model from it when set (other models, e.g. a reindex target, fall back to torch).
+EMBEDDING_MODEL_DIR = os.getenv("EMBEDDING_MODEL_DIR")
+EMBEDDING_QUANTIZATION_CONFIG = os.getenv("EMBEDDING_QUANTIZATION_CONFIG", "avx2")
+
+# eager: load the model before serving (blocks startup), background: serve immediately and load
+# in a thread, lazy: load on the first request that needs it.
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "eager")
+
+# user_questions collection layout, applied on creation and by `python -m qdrant_service.migrate`.
+QDRANT_QUANTIZATION = os.getenv("QDRANT_QUANTIZATION", "none")  # none, scalar or binary
+QDRANT_QUANTIZATION_ALWAYS_RAM = os.getenv("QDRANT_QUANTIZATION_ALWAYS_RAM", "true").lower() == "true"
+QDRANT_VECTORS_ON_DISK = os.getenv("QDRANT_VECTORS_ON_DISK", "false").lower() == "true"
+QDRANT_HNSW_M = int(os.getenv("QDRANT_HNSW_M", "0")) or None
+QDRANT_HNSW_EF_CONSTRUCT = int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", "0")) or None
+QDRANT_HNSW_ON_DISK = os.getenv("QDRANT_HNSW_ON_DISK", "false").lower() == "true"
+QDRANT_SEARCH_HNSW_EF = int(os.getenv("QDRANT_SEARCH_HNSW_EF", "0")) or None
+QDRANT_SEARCH_RESCORE = os.getenv("QDRANT_SEARCH_RESCORE", "true").lower() == "true"
+QDRANT_SEARCH_OVERSAMPLING = float(os.getenv("QDRANT_SEARCH_OVERSAMPLING", "0")) or None
+# Comma-separated field:schema pairs for the fields search filters can use.
+QDRANT_PAYLOAD_INDEXES = os.getenv("QDRANT_PAYLOAD_INDEXES", "chat_id:keyword,language:keyword,created_at:float")
+# Seconds between re-checks of the collection's vector size and model (writes always re-check).
+QDRANT_COLLECTION_CHECK_INTERVAL = float(os.getenv("QDRANT_COLLECTION_CHECK_INTERVAL", "30"))
+# How long a request waits for the alias while a plain collection is being migrated.
+QDRANT_ALIAS_SWITCH_TIMEOUT = float(os.getenv("QDRANT_ALIAS_SWITCH_TIMEOUT", "60"))
+
+SEARCH_BATCH_MAX_ITEMS = int(os.getenv("SEARCH_BATCH_MAX_ITEMS", "64"))
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+IMPORT_PARALLELISM = int(os.getenv("IMPORT_PARALLELISM", "4"))
+
+REINDEX_BATCH_SIZE = int(os.getenv("REINDEX_BATCH_SIZE", "512"))
+# Upper bound on re-embedded points per second; 0 disables throttling.
+REINDEX_POINTS_PER_SECOND = float(os.getenv("REINDEX_POINTS_PER_SECOND", "200"))
+
+# Port of the Prometheus exporter started by each Celery worker; 0 disables it.
+CELERY_METRICS_PORT = int(os.getenv("CELERY_METRICS_PORT", "0"))
+
+# Where GET /pattern results are cached: memory (per process), redis (shared) or none.
+SEARCH_CACHE_BACKEND = os.getenv("SEARCH_CACHE_BACKEND", "memory")
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "10000"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "3600"))
+
+REPLICA_ENABLED = os.getenv("REPLICA_ENABLED", "false").lower() == "true"
+REPLICA_DTYPE = os.getenv("REPLICA_DTYPE", "float32")
+REPLICA_MAX_BYTES = int(os.getenv("REPLICA_MAX_BYTES", str(2 * 1024 ** 3)))
+REPLICA_SYNC_INTERVAL = float(os.getenv("REPLICA_SYNC_INTERVAL", "30"))
+REPLICA_FULL_RELOAD_INTERVAL = float(os.getenv("REPLICA_FULL_RELOAD_INTERVAL", "3600"))
+REPLICA_LOAD_BATCH_SIZE = int(os.getenv("REPLICA_LOAD_BATCH_SIZE", "2000"))
+
+# How long AI extraction results are cached per chunk text, and a chat's completed
+# chunks are remembered for a retried run; 0 disables both.
+AI_CACHE_TTL = int(os.getenv("AI_CACHE_TTL", str(7 * 24 * 3600)))
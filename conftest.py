@@ -1,12 +1,23 @@
+import os
+
+# Set before config loads .env (which never overrides): the suite must neither depend on
+# nor write to a developer's Redis (search-cache versions, AI-cache checkpoints). Tests
+# that exercise the Redis code paths patch in fakes.
+os.environ['REDIS_URL'] = ''
+os.environ['SEARCH_CACHE_BACKEND'] = 'memory'
+
+import pytest
 import pytest_asyncio
 from typing import AsyncGenerator
 from fastapi import FastAPI
 from httpx import AsyncClient, ASGITransport
 from unittest.mock import AsyncMock
 
+from core.embedding import embedding_cache
 from deps import get_embedding_model
 from main import create_app
 from qdrant_service.base import get_qdrant_client
+from qdrant_service.search_cache import reset_search_cache
 
 
 class DummyVector(list):
@@ -17,13 +28,29 @@ class DummyModel:
     def __init__(self, dim: int = 3):
         self.dim = dim
 
-    def encode(self, text, convert_to_numpy=True):
+    def encode(self, text, convert_to_numpy=True, **kwargs):
+        if isinstance(text, list):
+            return [DummyVector([0.1] * self.dim) for _ in text]
         return DummyVector([0.1] * self.dim)
 
     def get_sentence_embedding_dimension(self):
         return self.dim
 
 
+@pytest.fixture(autouse=True)
+def clear_embedding_cache():
+    embedding_cache.clear()
+    yield
+    embedding_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_search_cache():
+    reset_search_cache()
+    yield
+    reset_search_cache()
+
+
 @pytest_asyncio.fixture
 async def app() -> FastAPI:
     return create_app()
@@ -0,0 +1,114 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple, Dict
+
+import numpy as np
+
+from config import EMBEDDING_MAX_BATCH_SIZE, EMBEDDING_MAX_WAIT_MS, EMBEDDING_MODEL_NAME
+from core.embedding_cache import EmbeddingCache
+from core.metrics import ENCODE_SECONDS, ENCODE_BATCH_SIZE, timed
+
+embedding_cache = EmbeddingCache()
+
+
+class EmbeddingEngine:
+    """
+    Micro-batching wrapper around a SentenceTransformer.
+
+    Concurrent ``encode`` calls are collected for up to ``max_wait_ms`` (or until
+    ``max_batch_size`` texts are pending) and encoded with a single batched
+    ``model.encode`` call in a dedicated worker thread, so the event loop is never
+    blocked by the forward pass. Texts already present in ``cache`` skip the model
+    entirely.
+    """
+
+    def __init__(
+        self,
+        model,
+        model_name: str = EMBEDDING_MODEL_NAME,
+        cache: Optional[EmbeddingCache] = None,
+        max_batch_size: int = EMBEDDING_MAX_BATCH_SIZE,
+        max_wait_ms: float = EMBEDDING_MAX_WAIT_MS,
+    ):
+        self.model = model
+        self.model_name = model_name
+        self.cache = cache
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='embedding')
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    async def encode(self, text: str) -> np.ndarray:
+        if self.cache is not None:
+            cached = self.cache.get(self.model_name, text)
+            if cached is not None:
+                return cached
+        loop = self._bind_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    async def encode_many(self, texts: List[str]) -> List[np.ndarray]:
+        if not texts:
+            return []
+        return list(await asyncio.gather(*(self.encode(text) for text in texts)))
+
+    def _bind_loop(self) -> asyncio.AbstractEventLoop:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Futures and timers belong to the loop that created them; anything left from a
+            # previous (closed) loop can never be resolved, so start over.
+            self._loop = loop
+            self._pending = []
+            self._timer = None
+        return loop
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            self._loop.create_task(self._run_batch(batch))
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        texts = [text for text, _ in batch]
+        try:
+            vectors = await self._loop.run_in_executor(self._executor, self._encode_sync, texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (text, future), vector in zip(batch, vectors):
+            if self.cache is not None:
+                self.cache.put(self.model_name, text, vector)
+            if not future.done():
+                future.set_result(vector)
+
+    def _encode_sync(self, texts: List[str]) -> np.ndarray:
+        ENCODE_BATCH_SIZE.observe(len(texts))
+        with timed(ENCODE_SECONDS):
+            vectors = self.model.encode(texts, convert_to_numpy=True, batch_size=len(texts))
+        return np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1)
+
+
+_engines: Dict[int, EmbeddingEngine] = {}
+
+
+def get_embedding_engine(model, model_name: str = EMBEDDING_MODEL_NAME) -> EmbeddingEngine:
+    engine = _engines.get(id(model))
+    if engine is None or engine.model is not model:
+        engine = EmbeddingEngine(model, model_name=model_name, cache=embedding_cache)
+        _engines[id(model)] = engine
+    return engine
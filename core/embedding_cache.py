@@ -0,0 +1,100 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional, Tuple, Dict
+
+import numpy as np
+
+from config import EMBEDDING_CACHE_MAX_BYTES, EMBEDDING_CACHE_MAX_ENTRIES, EMBEDDING_CACHE_TTL
+from core.metrics import CACHE_REQUESTS
+
+# Rough per-entry bookkeeping cost (OrderedDict node, key tuple, ndarray header).
+_ENTRY_OVERHEAD = 200
+
+
+def normalize_text(text: str) -> str:
+    return ' '.join(text.split()).casefold()
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU cache of float32 embeddings keyed on (model name, normalized text).
+
+    Entries are evicted least-recently-used first once either ``max_entries`` or
+    ``max_bytes`` is exceeded; with ``ttl`` > 0 entries older than ``ttl`` seconds
+    are treated as misses.
+    """
+
+    def __init__(self, max_bytes: int = EMBEDDING_CACHE_MAX_BYTES, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES, ttl: float = EMBEDDING_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[Tuple[str, str], Tuple[np.ndarray, float]] = OrderedDict()
+        self._bytes = 0
+        self._lock = Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 and self.max_entries > 0
+
+    def get(self, model_name: str, text: str) -> Optional[np.ndarray]:
+        if not self.enabled:
+            return None
+        key = (model_name, normalize_text(text))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                CACHE_REQUESTS.labels('embedding', 'miss').inc()
+                return None
+            vector, stored_at = entry
+            if self.ttl > 0 and time.monotonic() - stored_at > self.ttl:
+                self._remove(key)
+                self.misses += 1
+                CACHE_REQUESTS.labels('embedding', 'miss').inc()
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            CACHE_REQUESTS.labels('embedding', 'hit').inc()
+            return vector
+
+    def put(self, model_name: str, text: str, vector: np.ndarray):
+        if not self.enabled:
+            return
+        key = (model_name, normalize_text(text))
+        # Copy so that a row of a batch result does not keep the whole batch array alive.
+        vector = np.array(vector, dtype=np.float32, copy=True)
+        vector.flags.writeable = False
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (vector, time.monotonic())
+            self._bytes += self._entry_size(key, vector)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def _remove(self, key: Tuple[str, str]):
+        vector, _ = self._entries.pop(key)
+        self._bytes -= self._entry_size(key, vector)
+
+    @staticmethod
+    def _entry_size(key: Tuple[str, str], vector: np.ndarray) -> int:
+        return vector.nbytes + len(key[1]) + _ENTRY_OVERHEAD
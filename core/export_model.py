@@ -0,0 +1,68 @@
+"""
+Export the embedding model for the ONNX backends.
+
+    python -m core.export_model models/minilm
+
+writes the ONNX model and its int8 dynamically-quantized variant into the directory,
+then checks both against the PyTorch fp32 embeddings. Point EMBEDDING_MODEL_DIR at
+the directory and set EMBEDDING_BACKEND=onnx or onnx-int8 to use them.
+"""
+import argparse
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+from config import EMBEDDING_MODEL_NAME, EMBEDDING_QUANTIZATION_CONFIG
+from qdrant_service.base import int8_model_file
+
+DEFAULT_SENTENCES = Path(__file__).resolve().parent.parent / 'benchmarks' / 'fixtures' / 'sentences.txt'
+
+
+def load_sentences(path: Path = DEFAULT_SENTENCES) -> List[str]:
+    return [line.strip() for line in path.read_text(encoding='utf-8').splitlines() if line.strip()]
+
+
+def embedding_agreement(reference: SentenceTransformer, candidate: SentenceTransformer, sentences: List[str]) -> np.ndarray:
+    """Cosine similarity between the two models' embeddings of each sentence."""
+    a = reference.encode(sentences, convert_to_numpy=True, normalize_embeddings=True)
+    b = candidate.encode(sentences, convert_to_numpy=True, normalize_embeddings=True)
+    return np.sum(a * b, axis=1)
+
+
+def export(output: Path, quantization_config: str = EMBEDDING_QUANTIZATION_CONFIG) -> List[str]:
+    output.mkdir(parents=True, exist_ok=True)
+    onnx_model = SentenceTransformer(EMBEDDING_MODEL_NAME, backend='onnx')
+    onnx_model.save_pretrained(str(output))
+    file_name = int8_model_file(quantization_config)
+    export_dynamic_quantized_onnx_model(
+        onnx_model, quantization_config, str(output), file_suffix=Path(file_name).stem.removeprefix('model_')
+    )
+    return ['onnx/model.onnx', file_name]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output', type=Path)
+    parser.add_argument('--quantization-config', default=EMBEDDING_QUANTIZATION_CONFIG,
+                        choices=['arm64', 'avx2', 'avx512', 'avx512_vnni'])
+    parser.add_argument('--min-cosine', type=float, default=0.98,
+                        help='fail if any fixture sentence agrees less with fp32 than this')
+    args = parser.parse_args()
+
+    files = export(args.output, args.quantization_config)
+    reference = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    sentences = load_sentences()
+    failed = False
+    for file_name in files:
+        candidate = SentenceTransformer(str(args.output), backend='onnx', model_kwargs={'file_name': file_name})
+        agreement = embedding_agreement(reference, candidate, sentences)
+        print(f'{file_name}: min cosine {agreement.min():.4f}, mean {agreement.mean():.4f}')
+        failed |= bool(agreement.min() < args.min_cosine)
+    if failed:
+        raise SystemExit(f'agreement with fp32 below {args.min_cosine}')
+
+
+if __name__ == '__main__':
+    main()
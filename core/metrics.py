@@ -0,0 +1,82 @@
+"""
+Prometheus metrics shared by the API and the Celery workers.
+
+The API serves them on ``/metrics``; a Celery worker serves them on CELERY_METRICS_PORT
+from its main process. Pool processes can't be scraped one by one, so run workers
+(and the API, when it has several uvicorn workers) with PROMETHEUS_MULTIPROC_DIR set
+to an empty directory: every process then writes its samples there and the exporter
+aggregates them.
+"""
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+ENCODE_SECONDS = Histogram('embedding_encode_seconds', 'Time to encode one embedding batch')
+ENCODE_BATCH_SIZE = Histogram('embedding_batch_size', 'Texts per embedding batch', buckets=SIZE_BUCKETS)
+QDRANT_SECONDS = Histogram('qdrant_request_seconds', 'Qdrant call latency', ['operation'])
+HTTP_SECONDS = Histogram(
+    'http_request_seconds', 'make_request latency, retries included', ['base_url'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+HTTP_RETRIES = Counter('http_request_retries', 'make_request attempts that were retried', ['base_url'])
+CHUNKING_SECONDS = Histogram('chunking_seconds', 'Time spent splitting a chat into chunks')
+CHAT_CHUNKS = Histogram('chat_chunks', 'Chunks per processed chat', buckets=SIZE_BUCKETS)
+CHAT_PATTERNS = Histogram('chat_patterns', 'Patterns extracted per processed chat', buckets=(0,) + SIZE_BUCKETS)
+CACHE_REQUESTS = Counter('cache_requests', 'Cache lookups by outcome', ['cache', 'result'])
+
+
+@contextmanager
+def timed(histogram: Histogram):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start)
+
+
+def _multiprocess_dir() -> str:
+    return os.getenv('PROMETHEUS_MULTIPROC_DIR', '')
+
+
+def get_registry() -> CollectorRegistry:
+    if not _multiprocess_dir():
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render() -> bytes:
+    return generate_latest(get_registry())
+
+
+def start_exporter(port: int):
+    """Serve the metrics of this process (and its pool processes) on ``port``."""
+    directory = _multiprocess_dir()
+    if directory:
+        # Files left by a previous run would be aggregated as if they were still alive.
+        for path in Path(directory).glob('*.db'):
+            path.unlink()
+    else:
+        print('PROMETHEUS_MULTIPROC_DIR is not set: only the main process metrics are exported')
+    start_http_server(port, registry=get_registry())
+
+
+def mark_process_dead(pid: int):
+    if _multiprocess_dir():
+        multiprocess.mark_process_dead(pid)
+
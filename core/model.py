@@ -1,11 +1,52 @@
-from typing import Optional
-from sentence_transformers import SentenceTransformer
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Optional, TYPE_CHECKING
+
 from qdrant_service.base import get_model
 
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+# Encoded once after loading so the first real request does not pay for lazy
+# initialisation (allocator warm-up, kernel selection) in the forward pass.
+WARMUP_BATCH = [
+    "Здравствуйте, когда придёт мой заказ?",
+    "How do I request a refund?",
+    "Не приходит код подтверждения на телефон, что делать?",
+    "ok",
+]
+
 _model: Optional[SentenceTransformer] = None
+_state = "cold"
+_lock = threading.Lock()
+_loading: Optional[asyncio.Future] = None
 
 def load_model() -> SentenceTransformer:
-    global _model
-    if _model is None:
-        _model = get_model()
+    global _model, _state
+    with _lock:
+        if _model is None:
+            _state = "loading"
+            try:
+                model = get_model()
+                model.encode(WARMUP_BATCH, convert_to_numpy=True, batch_size=len(WARMUP_BATCH))
+            except Exception:
+                _state = "failed"
+                raise
+            _model = model
+            _state = "ready"
     return _model
+
+def model_state() -> str:
+    """cold, loading, ready or failed."""
+    return _state
+
+async def load_model_async() -> SentenceTransformer:
+    """Load the model in a worker thread; concurrent callers share one load."""
+    global _loading
+    if _model is not None:
+        return _model
+    if _loading is None or (_loading.done() and _loading.exception() is not None):
+        _loading = asyncio.get_running_loop().run_in_executor(None, load_model)
+    return await asyncio.shield(_loading)
@@ -0,0 +1,42 @@
+"""
+Redis clients shared by the API, the Celery workers and the CLI jobs. Without REDIS_URL
+every Redis-backed feature (notifications, caches, checkpoints) turns itself off.
+"""
+import asyncio
+from typing import Optional
+
+import redis
+from redis import asyncio as aioredis
+
+from config import REDIS_URL, REDIS_SOCKET_TIMEOUT
+
+_redis: Optional[redis.Redis] = None
+_async_redis: Optional[aioredis.Redis] = None
+_async_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def redis_enabled() -> bool:
+    return bool(REDIS_URL)
+
+
+def get_redis() -> redis.Redis:
+    """Process-wide client for synchronous code (Celery task bodies, CLI jobs)."""
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(
+            REDIS_URL, socket_timeout=REDIS_SOCKET_TIMEOUT, socket_connect_timeout=REDIS_SOCKET_TIMEOUT
+        )
+    return _redis
+
+
+def get_async_redis() -> aioredis.Redis:
+    """Client for coroutines, one per event loop."""
+    global _async_redis, _async_loop
+    loop = asyncio.get_running_loop()
+    if _async_redis is None or _async_loop is not loop:
+        # Like the HTTP client, pooled connections belong to the loop that opened them.
+        _async_redis = aioredis.Redis.from_url(
+            REDIS_URL, socket_timeout=REDIS_SOCKET_TIMEOUT, socket_connect_timeout=REDIS_SOCKET_TIMEOUT
+        )
+        _async_loop = loop
+    return _async_redis
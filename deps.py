@@ -1,5 +1,18 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
 from fastapi import Request
-from sentence_transformers import SentenceTransformer
 
-def get_embedding_model(request: Request) -> SentenceTransformer:
-    return request.app.state.model
+from core.model import load_model_async
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+
+async def get_embedding_model(request: Request) -> SentenceTransformer:
+    model = getattr(request.app.state, "model", None)
+    if model is None:
+        # background/lazy warm-up: wait for (or trigger) the shared load.
+        model = request.app.state.model = await load_model_async()
+    return model
@@ -1,8 +1,116 @@
 import asyncio
-from typing import Literal
+import random
+import time
+from typing import Literal, Optional, Dict
+
+import httpx
 from httpx import AsyncClient
 
-from config import CHATS_MANAGER_URL
+from config import (
+    CHATS_MANAGER_URL,
+    HTTP_TIMEOUT,
+    HTTP_MAX_ATTEMPTS,
+    HTTP_BACKOFF_BASE,
+    HTTP_BACKOFF_MAX,
+    HTTP_POOL_MAX_CONNECTIONS,
+    HTTP_POOL_MAX_KEEPALIVE,
+    CIRCUIT_BREAKER_FAILURES,
+    CIRCUIT_BREAKER_RESET_TIMEOUT,
+)
+from core.metrics import HTTP_SECONDS, HTTP_RETRIES, timed
+
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class CircuitBreaker:
+    """
+    Opens after ``failure_threshold`` consecutive failures and rejects calls for
+    ``reset_timeout`` seconds, then lets a single trial call through (half-open).
+    """
+
+    def __init__(self, failure_threshold: int = CIRCUIT_BREAKER_FAILURES, reset_timeout: float = CIRCUIT_BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            # Half-open: one trial call; a failure re-opens the breaker for another period.
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+_client: Optional[AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+# Overrides the network transport, e.g. with httpx.ASGITransport for stand-in services.
+_transport: Optional[httpx.AsyncBaseTransport] = None
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_http_client() -> AsyncClient:
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        # Pooled connections belong to the loop that opened them.
+        _client = AsyncClient(
+            transport=_transport,
+            timeout=HTTP_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=HTTP_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_POOL_MAX_KEEPALIVE,
+            ),
+        )
+        _client_loop = loop
+    return _client
+
+
+def set_http_transport(transport: Optional[httpx.AsyncBaseTransport]):
+    """Route every make_request through ``transport``; the next call opens a new client."""
+    global _transport, _client, _client_loop
+    _transport, _client, _client_loop = transport, None, None
+
+
+async def close_http_client():
+    global _client, _client_loop
+    if _client is not None:
+        client, _client, _client_loop = _client, None, None
+        await client.aclose()
+
+
+def get_breaker(base_url: str) -> CircuitBreaker:
+    breaker = _breakers.get(base_url)
+    if breaker is None:
+        breaker = _breakers[base_url] = CircuitBreaker()
+    return breaker
+
+
+def _backoff_delay(attempt: int, response: Optional[httpx.Response] = None) -> float:
+    if response is not None:
+        retry_after = response.headers.get('retry-after', '')
+        if retry_after.isdigit():
+            return min(float(retry_after), HTTP_BACKOFF_MAX)
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * 2 ** attempt))
+
+
+def _failure(status: int) -> dict:
+    return {
+        'status': status,
+        'headers': {},
+        'body': {},
+    }
 
 
 async def make_request(
@@ -10,29 +118,40 @@ async def make_request(
     method: Literal['GET', 'POST', 'PUT', 'DELETE'] = 'GET',
     data: dict = None,
     base_url: str = CHATS_MANAGER_URL,
+    timeout: Optional[float] = None,
+    params: Optional[dict] = None,
 ) -> dict:
-    attempts = 3
-    attempt = 0
-
+    breaker = get_breaker(base_url)
     url = f'{base_url}{url}'
 
-    while True:
-        try:
-            async with AsyncClient(timeout=120) as session:
-                response = await session.request(method, url, json=data)
-                content = response.json()
-                return {
-                    'status': response.status_code,
-                    'headers': dict(response.headers),
-                    'body': content,
-                }
-        except Exception as e:
-            print(e)
-            attempt += 1
-            await asyncio.sleep(1)
-            if attempt == attempts:
-                return {
-                    'status': 500,
-                    'headers': {},
-                    'body': {},
-                }
\ No newline at end of file
+    with timed(HTTP_SECONDS.labels(base_url)):
+        for attempt in range(HTTP_MAX_ATTEMPTS):
+            if not breaker.allow():
+                print(f'circuit open for {base_url}, skipping {method} {url}')
+                return _failure(503)
+            response = None
+            try:
+                response = await get_http_client().request(
+                    method, url, json=data, params=params, timeout=timeout or HTTP_TIMEOUT
+                )
+            except httpx.TransportError as e:
+                print(f'{method} {url} failed: {e!r}')
+                breaker.record_failure()
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    breaker.record_success()
+                    try:
+                        content = response.json()
+                    except ValueError:
+                        content = None
+                    return {
+                        'status': response.status_code,
+                        'headers': dict(response.headers),
+                        'body': content,
+                    }
+                print(f'{method} {url} returned {response.status_code}')
+                breaker.record_failure()
+            if attempt + 1 < HTTP_MAX_ATTEMPTS:
+                HTTP_RETRIES.labels(base_url).inc()
+                await asyncio.sleep(_backoff_delay(attempt, response))
+        return _failure(response.status_code if response is not None else 500)
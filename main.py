@@ -1,17 +1,48 @@
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 
 import uvicorn
 from fastapi import FastAPI
-from fastapi.responses import JSONResponse
-from core.model import load_model
+from fastapi.responses import JSONResponse, Response
+from config import MODEL_WARMUP, REPLICA_ENABLED
+from core.metrics import CONTENT_TYPE_LATEST, render
+from core.model import load_model, load_model_async, model_state
+from external_service import close_http_client
+from qdrant_service.base import init_qdrant_client, close_qdrant_client
+from qdrant_service.replica import run_replica_sync
+from qdrant_service.service import QdrantService, prepare_collection
 from routers.pattern import pattern_router
 
 
 def create_app() -> FastAPI:
+    async def warm_up(app: FastAPI):
+        try:
+            app.state.model = await load_model_async()
+        except Exception as e:
+            print('model warm-up failed: ', e)
+            return
+        await prepare_collection(init_qdrant_client(), app.state.model)
+
     @asynccontextmanager
     async def lifespan(app: FastAPI):
-        app.state.model = load_model()
+        app.state.model = None
+        warmup = None
+        replica_sync = None
+        if REPLICA_ENABLED:
+            replica_sync = asyncio.create_task(run_replica_sync(init_qdrant_client(), QdrantService.COLLECTION_NAME))
+        if MODEL_WARMUP == "eager":
+            app.state.model = load_model()
+            await prepare_collection(init_qdrant_client(), app.state.model)
+        elif MODEL_WARMUP == "background":
+            warmup = asyncio.create_task(warm_up(app))
         yield
+        for task in (warmup, replica_sync):
+            if task is not None:
+                task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await task
+        await close_qdrant_client()
+        await close_http_client()
 
 
 
@@ -21,6 +52,17 @@ def create_app() -> FastAPI:
     async def _unhandled_exc_handler(request, exc):
         return JSONResponse(status_code=500, content={"detail": "internal error"})
 
+    @app.get("/ready")
+    async def ready():
+        state = model_state()
+        # In lazy mode the first request loads the model, so it must not gate readiness.
+        is_ready = state == "ready" or (MODEL_WARMUP == "lazy" and state != "failed")
+        return JSONResponse(status_code=200 if is_ready else 503, content={"model": state, "warmup": MODEL_WARMUP})
+
+    @app.get("/metrics")
+    async def metrics():
+        return Response(content=render(), media_type=CONTENT_TYPE_LATEST)
+
     app.include_router(pattern_router, prefix="/pattern")
     return app
 
@@ -31,4 +73,4 @@ app = create_app()
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="localhost", port=8004)
\ No newline at end of file
+    uvicorn.run(app, host="localhost", port=8004)
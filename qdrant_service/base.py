@@ -1,16 +1,84 @@
-from typing import AsyncGenerator
+from __future__ import annotations
+
+from typing import AsyncGenerator, Optional, TYPE_CHECKING
+
+import httpx
 from qdrant_client import AsyncQdrantClient
-import os
 
-from sentence_transformers import SentenceTransformer
+from config import (
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_BACKEND,
+    EMBEDDING_MODEL_DIR,
+    EMBEDDING_QUANTIZATION_CONFIG,
+    QDRANT_URL,
+    QDRANT_TIMEOUT,
+    QDRANT_PREFER_GRPC,
+    QDRANT_POOL_MAX_CONNECTIONS,
+    QDRANT_POOL_MAX_KEEPALIVE,
+    QDRANT_POOL_KEEPALIVE_EXPIRY,
+)
 
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
 
-async def get_qdrant_client() -> AsyncGenerator[AsyncQdrantClient, None]:
-    client = AsyncQdrantClient(url=os.getenv("QDRANT_URL", "http://127.0.0.1:6333"))
-    try:
-        yield client
-    finally:
+_client: Optional[AsyncQdrantClient] = None
+
+
+def create_qdrant_client() -> AsyncQdrantClient:
+    return AsyncQdrantClient(
+        url=QDRANT_URL or "http://127.0.0.1:6333",
+        prefer_grpc=QDRANT_PREFER_GRPC,
+        timeout=QDRANT_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=QDRANT_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=QDRANT_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=QDRANT_POOL_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+def init_qdrant_client() -> AsyncQdrantClient:
+    """Return the process-wide client, creating it on first use."""
+    global _client
+    if _client is None:
+        _client = create_qdrant_client()
+    return _client
+
+
+async def close_qdrant_client():
+    global _client
+    if _client is not None:
+        client, _client = _client, None
         await client.close()
 
-def get_model() -> SentenceTransformer:
-    return SentenceTransformer("paraphrase-multilingual-MiniLM-L12-v2")
\ No newline at end of file
+
+async def get_qdrant_client() -> AsyncGenerator[AsyncQdrantClient, None]:
+    yield init_qdrant_client()
+
+def int8_model_file(quantization_config: str = EMBEDDING_QUANTIZATION_CONFIG) -> str:
+    # Named explicitly at export: sentence-transformers would derive qint8 or quint8 from the config.
+    return f"onnx/model_int8_{quantization_config}.onnx"
+
+
+def get_model(backend: str = EMBEDDING_BACKEND, model_name: str = EMBEDDING_MODEL_NAME) -> SentenceTransformer:
+    # Imported here: sentence_transformers pulls in torch, which dominates cold start.
+    from sentence_transformers import SentenceTransformer
+
+    if backend != "torch" and EMBEDDING_MODEL_DIR and model_name != EMBEDDING_MODEL_NAME:
+        # The export dir holds the configured model only; another model (e.g. the target
+        # of a reindex) has no export here, so it runs on torch rather than silently
+        # loading the old weights.
+        print(f"no ONNX export for {model_name}, loading it with torch")
+        backend = "torch"
+    if backend == "torch":
+        return SentenceTransformer(model_name)
+    path = EMBEDDING_MODEL_DIR or model_name
+    if backend == "onnx":
+        return SentenceTransformer(path, backend="onnx")
+    if backend == "onnx-int8":
+        return SentenceTransformer(
+            path,
+            backend="onnx",
+            model_kwargs={"file_name": int8_model_file()},
+        )
+    raise ValueError(f"unknown embedding backend: {backend}")
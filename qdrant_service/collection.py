@@ -0,0 +1,243 @@
+import asyncio
+import time
+from uuid import uuid4
+from typing import Optional, Union, List, Tuple
+
+import grpc
+from grpc.aio import AioRpcError
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http.exceptions import UnexpectedResponse, ResponseHandlingException
+from qdrant_client.http.models import (
+    Distance,
+    VectorParams,
+    HnswConfigDiff,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    SearchParams,
+    QuantizationSearchParams,
+    PayloadSchemaType,
+    PointStruct,
+    CreateAliasOperation,
+    CreateAlias,
+    DeleteAliasOperation,
+    DeleteAlias,
+)
+
+from config import (
+    QDRANT_QUANTIZATION,
+    QDRANT_QUANTIZATION_ALWAYS_RAM,
+    QDRANT_VECTORS_ON_DISK,
+    QDRANT_HNSW_M,
+    QDRANT_HNSW_EF_CONSTRUCT,
+    QDRANT_HNSW_ON_DISK,
+    QDRANT_SEARCH_HNSW_EF,
+    QDRANT_SEARCH_RESCORE,
+    QDRANT_SEARCH_OVERSAMPLING,
+    QDRANT_PAYLOAD_INDEXES,
+)
+
+# Collection metadata key naming the model the vectors were encoded with.
+MODEL_METADATA_KEY = "embedding_model"
+
+# Errors a Qdrant call raises over REST and, with QDRANT_PREFER_GRPC, over gRPC.
+QDRANT_ERRORS = (UnexpectedResponse, AioRpcError)
+QDRANT_UNREACHABLE_ERRORS = (ResponseHandlingException, AioRpcError)
+
+
+def is_not_found(e: Exception) -> bool:
+    if isinstance(e, UnexpectedResponse):
+        return e.status_code == 404
+    return isinstance(e, AioRpcError) and e.code() == grpc.StatusCode.NOT_FOUND
+
+
+def is_unreachable(e: Exception) -> bool:
+    if isinstance(e, ResponseHandlingException):
+        return True
+    return isinstance(e, AioRpcError) and e.code() in (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED)
+
+
+def vectors_config(size: int) -> VectorParams:
+    return VectorParams(size=size, distance=Distance.COSINE, on_disk=QDRANT_VECTORS_ON_DISK or None)
+
+
+def quantization_config() -> Optional[Union[ScalarQuantization, BinaryQuantization]]:
+    if QDRANT_QUANTIZATION == "scalar":
+        return ScalarQuantization(scalar=ScalarQuantizationConfig(
+            type=ScalarType.INT8, quantile=0.99, always_ram=QDRANT_QUANTIZATION_ALWAYS_RAM
+        ))
+    if QDRANT_QUANTIZATION == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=QDRANT_QUANTIZATION_ALWAYS_RAM))
+    if QDRANT_QUANTIZATION != "none":
+        raise ValueError(f"unknown quantization: {QDRANT_QUANTIZATION}")
+    return None
+
+
+def hnsw_config() -> Optional[HnswConfigDiff]:
+    if QDRANT_HNSW_M is None and QDRANT_HNSW_EF_CONSTRUCT is None and not QDRANT_HNSW_ON_DISK:
+        return None
+    return HnswConfigDiff(m=QDRANT_HNSW_M, ef_construct=QDRANT_HNSW_EF_CONSTRUCT, on_disk=QDRANT_HNSW_ON_DISK or None)
+
+
+def search_params() -> Optional[SearchParams]:
+    quantization = None
+    if QDRANT_QUANTIZATION != "none":
+        # Search the quantized vectors, then rescore the candidates with the originals.
+        quantization = QuantizationSearchParams(rescore=QDRANT_SEARCH_RESCORE, oversampling=QDRANT_SEARCH_OVERSAMPLING)
+    if QDRANT_SEARCH_HNSW_EF is None and quantization is None:
+        return None
+    return SearchParams(hnsw_ef=QDRANT_SEARCH_HNSW_EF, quantization=quantization)
+
+
+def payload_indexes() -> List[Tuple[str, PayloadSchemaType]]:
+    indexes = []
+    for item in QDRANT_PAYLOAD_INDEXES.split(","):
+        if item.strip():
+            field, schema = item.strip().split(":")
+            indexes.append((field.strip(), PayloadSchemaType(schema.strip())))
+    return indexes
+
+
+def new_collection_name(name: str) -> str:
+    """
+    ``<name>_<timestamp>_<random>`` for a physical collection behind the ``name`` alias.
+    The suffix keeps processes starting in the same second from picking the same name;
+    the timestamp keeps names sorting by age.
+    """
+    return f"{name}_{int(time.time())}_{uuid4().hex[:8]}"
+
+
+async def create_collection(client: AsyncQdrantClient, name: str, size: int, model_name: Optional[str] = None):
+    await client.create_collection(
+        name,
+        vectors_config=vectors_config(size),
+        hnsw_config=hnsw_config(),
+        quantization_config=quantization_config(),
+        metadata={MODEL_METADATA_KEY: model_name} if model_name else None,
+    )
+    for field, schema in payload_indexes():
+        await client.create_payload_index(name, field_name=field, field_schema=schema)
+
+
+def collection_model(info) -> Optional[str]:
+    """The model recorded on a collection by create_collection, None for older collections."""
+    metadata = getattr(getattr(info, "config", None), "metadata", None)
+    model = metadata.get(MODEL_METADATA_KEY) if isinstance(metadata, dict) else None
+    return model if isinstance(model, str) else None
+
+
+async def model_collection(client: AsyncQdrantClient, name: str, model_name: str, size: int) -> Optional[str]:
+    """
+    The newest ``<name>_*`` collection encoded with ``model_name`` at ``size``, e.g. the
+    one ``name`` pointed to before a re-index switched it to another model.
+    """
+    collections = await client.get_collections()
+    for candidate in sorted((c.name for c in collections.collections if c.name.startswith(f"{name}_")), reverse=True):
+        info = await client.get_collection(collection_name=candidate)
+        if collection_model(info) == model_name and info.config.params.vectors.size == size:
+            return candidate
+    return None
+
+
+async def create_aliased_collection(client: AsyncQdrantClient, name: str, size: int, model_name: Optional[str] = None) -> str:
+    """
+    Create ``name`` as an alias of a new physical ``<name>_<timestamp>_*`` collection, so
+    migrations and re-indexes only ever swap the alias. If another process wins the race
+    to create ``name``, its collection is kept and ours is dropped.
+    """
+    target = new_collection_name(name)
+    try:
+        await create_collection(client, target, size, model_name)
+    except QDRANT_ERRORS:
+        if await client.collection_exists(name):
+            return name
+        raise
+    try:
+        await switch_alias(client, name, target, had_alias=False)
+    except QDRANT_ERRORS:
+        await client.delete_collection(collection_name=target)
+        if not await client.collection_exists(name):
+            raise
+    return target
+
+
+async def resolve_alias(client: AsyncQdrantClient, name: str) -> Optional[str]:
+    """Return the collection ``name`` points to if it is an alias, else None."""
+    aliases = await client.get_aliases()
+    for alias in aliases.aliases:
+        if alias.alias_name == name:
+            return alias.collection_name
+    return None
+
+
+async def alias_switch_pending(client: AsyncQdrantClient, name: str) -> bool:
+    """
+    True if ``name`` is missing while ``<name>_*`` collections exist: a migration or
+    re-index of a plain collection is between deleting it and creating the alias.
+    """
+    collections = await client.get_collections()
+    return any(c.name.startswith(f"{name}_") for c in collections.collections)
+
+
+async def wait_for_collection(client: AsyncQdrantClient, name: str, timeout: float, interval: float = 0.5):
+    deadline = time.monotonic() + timeout
+    while not await client.collection_exists(name):
+        if time.monotonic() >= deadline:
+            raise RuntimeError(f"{name} is missing but other {name}_* collections exist; not recreating it empty")
+        await asyncio.sleep(interval)
+    return await client.get_collection(collection_name=name)
+
+
+async def copy_points(client: AsyncQdrantClient, source: str, target: str, batch_size: int = 1000) -> int:
+    copied = 0
+    offset = None
+    while True:
+        points, offset = await client.scroll(
+            collection_name=source, limit=batch_size, offset=offset, with_payload=True, with_vectors=True
+        )
+        if points:
+            await client.upsert(
+                collection_name=target,
+                points=[PointStruct(id=p.id, vector=p.vector, payload=p.payload) for p in points],
+                wait=True,
+            )
+            copied += len(points)
+            print(f'{source} -> {target}: {copied} points')
+        if offset is None:
+            return copied
+
+
+async def switch_alias(client: AsyncQdrantClient, alias: str, target: str, had_alias: bool):
+    operations = []
+    if had_alias:
+        operations.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=alias)))
+    operations.append(CreateAliasOperation(create_alias=CreateAlias(collection_name=target, alias_name=alias)))
+    # Delete + create in one request is applied atomically by Qdrant.
+    await client.update_collection_aliases(change_aliases_operations=operations)
+
+
+async def migrate_collection(client: AsyncQdrantClient, name: str, batch_size: int = 1000, drop_old: bool = False) -> str:
+    """
+    Recreate ``name`` with the currently configured layout.
+
+    Points are copied into a new physical collection ``<name>_<timestamp>_*`` and
+    ``name`` becomes (or is repointed as) an alias of it. A plain collection called
+    ``name`` (created before collections were aliased from the start) has to be deleted
+    before the alias can take its place; requests made in that gap wait for the alias
+    instead of recreating ``name``.
+    """
+    source = await resolve_alias(client, name)
+    had_alias = source is not None
+    source = source or name
+    info = await client.get_collection(collection_name=source)
+    target = new_collection_name(name)
+    await create_collection(client, target, info.config.params.vectors.size, collection_model(info))
+    await copy_points(client, source, target, batch_size)
+    if not had_alias:
+        await client.delete_collection(collection_name=source)
+    await switch_alias(client, name, target, had_alias)
+    if had_alias and drop_old:
+        await client.delete_collection(collection_name=source)
+    return target
@@ -0,0 +1,28 @@
+from typing import List, Sequence
+
+import numpy as np
+
+
+def near_duplicate_representatives(vectors: Sequence[np.ndarray], threshold: float) -> List[int]:
+    """
+    Return indices of the vectors to keep so that no two kept vectors have a cosine
+    similarity of ``threshold`` or more.
+
+    Vectors are clustered greedily in input order: each vector not yet assigned to a
+    cluster becomes a representative and absorbs every later vector similar to it.
+    """
+    if len(vectors) == 0:
+        return []
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = matrix / np.where(norms == 0, 1, norms)
+    similar = (matrix @ matrix.T) >= threshold
+
+    assigned = np.zeros(len(matrix), dtype=bool)
+    keep: List[int] = []
+    for i in range(len(matrix)):
+        if assigned[i]:
+            continue
+        keep.append(i)
+        assigned |= similar[i]
+    return keep
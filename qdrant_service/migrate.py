@@ -0,0 +1,33 @@
+"""
+Recreate the pattern collection with the layout from settings (quantization, on-disk
+vectors, HNSW parameters, payload indexes):
+
+    python -m qdrant_service.migrate [--batch-size 1000] [--drop-old]
+"""
+import argparse
+import asyncio
+
+from qdrant_service.base import create_qdrant_client
+from qdrant_service.collection import migrate_collection
+from qdrant_service.service import QdrantService
+
+
+async def run(batch_size: int, drop_old: bool):
+    client = create_qdrant_client()
+    try:
+        target = await migrate_collection(client, QdrantService.COLLECTION_NAME, batch_size, drop_old)
+        print(f'{QdrantService.COLLECTION_NAME} now points to {target}')
+    finally:
+        await client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--drop-old', action='store_true', help='delete the previous collection behind the alias')
+    args = parser.parse_args()
+    asyncio.run(run(args.batch_size, args.drop_old))
+
+
+if __name__ == '__main__':
+    main()
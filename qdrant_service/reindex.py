@@ -0,0 +1,187 @@
+"""
+Re-embed the pattern collection with another model without taking search down:
+
+    python -m qdrant_service.reindex <model-name> [--batch-size 512] [--points-per-second 200] [--drop-old]
+
+Questions are scrolled out of the collection behind ``user_questions``, encoded with
+the new model and written into a new ``user_questions_<timestamp>_*`` collection; the
+alias is switched once everything, including patterns saved while the job ran, has
+been copied. Progress is checkpointed in Redis, so an interrupted run resumes where
+it stopped. The new collection records the model it was encoded with: after the switch
+(noticed within QDRANT_COLLECTION_CHECK_INTERVAL) the API and workers still on the old
+model keep reading and writing the previous collection until they are restarted with
+EMBEDDING_MODEL_NAME pointing at the new model. Patterns they save in that window stay
+in the previous collection, so keep it (no --drop-old) until the rollout is done.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, List, Optional, TYPE_CHECKING
+
+import redis
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http.models import PointStruct, Filter, FieldCondition, Range
+
+from config import EMBEDDING_BACKEND, REINDEX_BATCH_SIZE, REINDEX_POINTS_PER_SECOND
+from core.redis_client import get_redis
+from qdrant_service.collection import create_collection, new_collection_name, resolve_alias, switch_alias
+from qdrant_service.search_cache import get_search_cache
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+CHECKPOINT_KEY = 'reindex:{name}'
+
+
+class RedisCheckpoint:
+    def __init__(self, client: redis.Redis, name: str):
+        self.client = client
+        self.key = CHECKPOINT_KEY.format(name=name)
+
+    def load(self) -> Optional[Dict]:
+        raw = self.client.get(self.key)
+        return json.loads(raw) if raw else None
+
+    def save(self, state: Dict):
+        self.client.set(self.key, json.dumps(state))
+
+    def clear(self):
+        self.client.delete(self.key)
+
+
+class Throttle:
+    """Sleeps just enough to keep the average rate at or below ``rate`` items per second."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.started = time.monotonic()
+        self.count = 0
+
+    async def wait(self, count: int):
+        self.count += count
+        if self.rate <= 0:
+            return
+        delay = self.count / self.rate - (time.monotonic() - self.started)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def reembed_points(client: AsyncQdrantClient, model: SentenceTransformer, target: str, points: List):
+    questions = [(p.payload or {}).get("question") or "" for p in points]
+    vectors = await asyncio.get_running_loop().run_in_executor(
+        None, lambda: model.encode(questions, convert_to_numpy=True, batch_size=len(questions))
+    )
+    await client.upsert(
+        collection_name=target,
+        points=[PointStruct(id=p.id, vector=vector.tolist(), payload=p.payload) for p, vector in zip(points, vectors)],
+        wait=True,
+    )
+
+
+async def reindex_collection(
+    client: AsyncQdrantClient,
+    model: SentenceTransformer,
+    name: str,
+    checkpoint: RedisCheckpoint,
+    batch_size: int = REINDEX_BATCH_SIZE,
+    points_per_second: float = REINDEX_POINTS_PER_SECOND,
+    drop_old: bool = False,
+    model_name: Optional[str] = None,
+) -> str:
+    """
+    Copy every pattern of ``name`` into a new collection embedded by ``model`` and
+    point the ``name`` alias at it; returns the new collection. ``model_name`` is
+    recorded on the new collection.
+
+    The run goes through three checkpointed phases: ``copy`` scrolls the whole source,
+    ``catch-up`` re-scrolls patterns created since the run started (new points may land
+    behind the copy cursor), ``switch`` swaps the alias. Deletes made while the job runs
+    are not carried over.
+    """
+    state = checkpoint.load()
+    if state is None:
+        source = await resolve_alias(client, name)
+        target = new_collection_name(name)
+        await create_collection(client, target, model.get_sentence_embedding_dimension(), model_name)
+        state = {
+            "source": source or name,
+            "had_alias": source is not None,
+            "target": target,
+            "phase": "copy",
+            "offset": None,
+            "done": 0,
+            "started_at": time.time(),
+        }
+        checkpoint.save(state)
+    else:
+        print(f'resuming re-index into {state["target"]}: {state["phase"]}, {state["done"]} points done')
+
+    throttle = Throttle(points_per_second)
+    while state["phase"] != "switch":
+        scroll_filter = None
+        if state["phase"] == "catch-up":
+            scroll_filter = Filter(must=[FieldCondition(key="created_at", range=Range(gte=state["started_at"]))])
+        points, offset = await client.scroll(
+            collection_name=state["source"],
+            limit=batch_size,
+            offset=state["offset"],
+            scroll_filter=scroll_filter,
+            with_payload=True,
+            with_vectors=False,
+        )
+        if points:
+            await reembed_points(client, model, state["target"], points)
+            state["done"] += len(points)
+        state["offset"] = offset
+        if offset is None:
+            state["phase"] = "catch-up" if state["phase"] == "copy" else "switch"
+        checkpoint.save(state)
+        print(f'{state["source"]} -> {state["target"]}: {state["done"]} points re-embedded')
+        await throttle.wait(len(points))
+
+    if not state["had_alias"]:
+        await client.delete_collection(collection_name=state["source"])
+    await switch_alias(client, name, state["target"], state["had_alias"])
+    await get_search_cache().bump(name)
+    if state["had_alias"] and drop_old:
+        await client.delete_collection(collection_name=state["source"])
+    checkpoint.clear()
+    return state["target"]
+
+
+async def run(model_name: str, backend: str, batch_size: int, points_per_second: float, drop_old: bool, restart: bool):
+    from qdrant_service.base import create_qdrant_client, get_model
+    from qdrant_service.service import QdrantService
+
+    name = QdrantService.COLLECTION_NAME
+    checkpoint = RedisCheckpoint(get_redis(), name)
+    if restart:
+        checkpoint.clear()
+    client = create_qdrant_client()
+    try:
+        target = await reindex_collection(
+            client, get_model(backend, model_name), name, checkpoint, batch_size, points_per_second, drop_old, model_name
+        )
+        print(f'{name} now points to {target}')
+    finally:
+        await client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('model_name')
+    parser.add_argument('--backend', default=EMBEDDING_BACKEND, choices=['torch', 'onnx', 'onnx-int8'])
+    parser.add_argument('--batch-size', type=int, default=REINDEX_BATCH_SIZE)
+    parser.add_argument('--points-per-second', type=float, default=REINDEX_POINTS_PER_SECOND,
+                        help='throttle re-embedding to this rate; 0 disables throttling')
+    parser.add_argument('--drop-old', action='store_true', help='delete the previous collection behind the alias')
+    parser.add_argument('--restart', action='store_true', help='ignore the checkpoint of an interrupted run')
+    args = parser.parse_args()
+    asyncio.run(run(args.model_name, args.backend, args.batch_size, args.points_per_second, args.drop_old, args.restart))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,280 @@
+"""
+Optional in-process read replica of the pattern collection.
+
+With REPLICA_ENABLED the API scrolls the collection into one contiguous float32 (or
+int8) matrix at startup and answers unfiltered searches with a vectorized dot product
+instead of a Qdrant round-trip. Writes made through QdrantService in this process are
+applied to the replica right away; writes from other processes (the Celery workers)
+arrive with the periodic incremental sync on ``created_at``, and a periodic full reload
+catches anything else (e.g. deletes made by another API instance). Qdrant stays the
+source of truth: filtered searches, and all searches while the replica is loading or
+over its memory budget, go to Qdrant.
+"""
+import asyncio
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http.models import Filter, FieldCondition, Range
+
+from config import (
+    REPLICA_DTYPE,
+    REPLICA_MAX_BYTES,
+    REPLICA_SYNC_INTERVAL,
+    REPLICA_FULL_RELOAD_INTERVAL,
+    REPLICA_LOAD_BATCH_SIZE,
+)
+
+# Rows scored per matmul; bounds the float32 temporary an int8 replica needs.
+SEARCH_BLOCK_ROWS = 65536
+# Overlap between incremental syncs, for clock skew between the writers and this host.
+SYNC_MARGIN = 5.0
+
+PointId = Union[int, str]
+
+
+class ReplicaFull(Exception):
+    pass
+
+
+class VectorReplica:
+    """
+    Normalized vectors of a cosine collection in a preallocated matrix, with their ids
+    and payloads. Thread-safe: searches run in an executor while writes come from the
+    event loop. Searches score without holding the lock; ``_version`` tells them whether
+    a write moved or replaced rows meanwhile (appends and growing don't).
+    """
+
+    def __init__(self, dimension: int, dtype: str = REPLICA_DTYPE, max_bytes: int = REPLICA_MAX_BYTES, capacity: int = 1024):
+        if dtype not in ("float32", "int8"):
+            raise ValueError(f"unknown replica dtype: {dtype}")
+        self.dimension = dimension
+        self.quantized = dtype == "int8"
+        self.max_points = max_bytes // (dimension * np.dtype(dtype).itemsize)
+        self._matrix = np.zeros((min(capacity, max(self.max_points, 1)), dimension), dtype=dtype)
+        self._ids: List[PointId] = []
+        self._payloads: List[Dict] = []
+        self._rows: Dict[PointId, int] = {}
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _normalize(self, vectors) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return vectors / norms
+
+    def _encode(self, vectors) -> np.ndarray:
+        vectors = self._normalize(vectors)
+        if self.quantized:
+            return np.clip(np.rint(vectors * 127), -127, 127).astype(np.int8)
+        return vectors
+
+    def _grow(self):
+        capacity = min(len(self._matrix) * 2, self.max_points)
+        matrix = np.zeros((capacity, self.dimension), dtype=self._matrix.dtype)
+        matrix[:len(self._ids)] = self._matrix[:len(self._ids)]
+        self._matrix = matrix
+
+    def upsert(self, points: Iterable):
+        """Insert or replace ``points`` (objects with id, vector, payload)."""
+        points = list(points)
+        if not points:
+            return
+        rows = self._encode([p.vector for p in points])
+        with self._lock:
+            for point, row in zip(points, rows):
+                i = self._rows.get(point.id)
+                if i is None:
+                    if len(self._ids) >= self.max_points:
+                        raise ReplicaFull(f"replica is limited to {self.max_points} points")
+                    if len(self._ids) == len(self._matrix):
+                        self._grow()
+                    i = len(self._ids)
+                    self._ids.append(point.id)
+                    self._payloads.append(point.payload or {})
+                    self._rows[point.id] = i
+                else:
+                    self._payloads[i] = point.payload or {}
+                    self._version += 1
+                self._matrix[i] = row
+
+    def delete(self, ids: Iterable[PointId]):
+        with self._lock:
+            for point_id in ids:
+                i = self._rows.pop(point_id, None)
+                if i is None:
+                    continue
+                self._version += 1
+                last = len(self._ids) - 1
+                if i != last:
+                    # Keep rows contiguous: move the last point into the hole.
+                    self._matrix[i] = self._matrix[last]
+                    self._ids[i] = self._ids[last]
+                    self._payloads[i] = self._payloads[last]
+                    self._rows[self._ids[i]] = i
+                self._ids.pop()
+                self._payloads.pop()
+
+    def search(self, vector, limit: int, score_threshold: Optional[float] = None) -> List[Tuple[PointId, float, Dict]]:
+        query = self._normalize(vector)[0]
+        if self.quantized:
+            # Stored rows are scaled by 127; undo it in the query instead of per row.
+            query = query / 127
+        if limit <= 0:
+            return []
+        for _ in range(2):
+            with self._lock:
+                matrix, count, version = self._matrix, len(self._ids), self._version
+            if count == 0:
+                return []
+            # Appends land past ``count`` and growing swaps in a new matrix, so this
+            # snapshot stays valid unless the version moves.
+            scores, rows = _top_rows(matrix, count, query, limit)
+            with self._lock:
+                if self._version == version:
+                    return self._hits(scores, rows, score_threshold)
+        # Rows keep moving under us (e.g. a burst of deletes): score under the lock.
+        with self._lock:
+            count = len(self._ids)
+            if count == 0:
+                return []
+            return self._hits(*_top_rows(self._matrix, count, query, limit), score_threshold)
+
+    def _hits(self, scores: np.ndarray, rows: np.ndarray, score_threshold: Optional[float]) -> List[Tuple[PointId, float, Dict]]:
+        return [
+            (self._ids[row], float(score), self._payloads[row])
+            for score, row in zip(scores, rows)
+            if score_threshold is None or score >= score_threshold
+        ]
+
+
+def _top_rows(matrix: np.ndarray, count: int, query: np.ndarray, limit: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Best ``limit`` of the first ``count`` rows by dot product with ``query``, best first."""
+    scores, rows = [], []
+    for start in range(0, count, SEARCH_BLOCK_ROWS):
+        block = matrix[start:min(count, start + SEARCH_BLOCK_ROWS)]
+        block_scores = block.astype(np.float32, copy=False) @ query
+        k = min(limit, len(block_scores))
+        top = np.argpartition(-block_scores, k - 1)[:k]
+        scores.append(block_scores[top])
+        rows.append(top + start)
+    scores, rows = np.concatenate(scores), np.concatenate(rows)
+    order = np.argsort(-scores, kind="stable")[:limit]
+    return scores[order], rows[order]
+
+
+_replica: Optional[VectorReplica] = None
+# Local writes made while a full reload is running, replayed onto the new replica.
+_journal: Optional[List[Callable[[VectorReplica], None]]] = None
+_synced_at = 0.0
+
+
+def get_replica() -> Optional[VectorReplica]:
+    return _replica
+
+
+def _apply(operation: Callable[[VectorReplica], None]):
+    global _replica
+    if _journal is not None:
+        _journal.append(operation)
+    if _replica is None:
+        return
+    try:
+        operation(_replica)
+    except ReplicaFull as e:
+        print('replica disabled, searches go to qdrant: ', e)
+        _replica = None
+
+
+def replica_upsert(points: List):
+    _apply(lambda replica: replica.upsert(points))
+
+
+def replica_delete(ids: List[PointId]):
+    _apply(lambda replica: replica.delete(ids))
+
+
+async def _scroll_into(client: AsyncQdrantClient, name: str, replica: VectorReplica, scroll_filter: Optional[Filter] = None) -> int:
+    loaded = 0
+    offset = None
+    while True:
+        points, offset = await client.scroll(
+            collection_name=name,
+            limit=REPLICA_LOAD_BATCH_SIZE,
+            offset=offset,
+            scroll_filter=scroll_filter,
+            with_payload=True,
+            with_vectors=True,
+        )
+        replica.upsert(points)
+        loaded += len(points)
+        if offset is None:
+            return loaded
+
+
+async def load_replica(client: AsyncQdrantClient, name: str):
+    """Build a fresh replica of ``name`` and swap it in, or drop it if it would not fit."""
+    global _replica, _journal, _synced_at
+    started = time.time()
+    _journal = []
+    try:
+        info = await client.get_collection(collection_name=name)
+        replica = VectorReplica(info.config.params.vectors.size, REPLICA_DTYPE, REPLICA_MAX_BYTES)
+        count = (await client.count(collection_name=name, exact=False)).count
+        if count > replica.max_points:
+            raise ReplicaFull(f"{count} points do not fit into {replica.max_points}")
+        loaded = await _scroll_into(client, name, replica)
+        for operation in _journal:
+            operation(replica)
+    except ReplicaFull as e:
+        print('replica disabled, searches go to qdrant: ', e)
+        _replica = None
+        return
+    finally:
+        _journal = None
+    _replica = replica
+    _synced_at = started
+    print(f'replica of {name} loaded: {loaded} points')
+
+
+async def sync_replica(client: AsyncQdrantClient, name: str):
+    """Pull points created since the previous sync."""
+    global _replica, _synced_at
+    replica = _replica
+    if replica is None:
+        return
+    started = time.time()
+    scroll_filter = Filter(must=[FieldCondition(key="created_at", range=Range(gte=_synced_at - SYNC_MARGIN))])
+    try:
+        await _scroll_into(client, name, replica, scroll_filter)
+    except ReplicaFull as e:
+        print('replica disabled, searches go to qdrant: ', e)
+        _replica = None
+        return
+    _synced_at = started
+
+
+async def run_replica_sync(client: AsyncQdrantClient, name: str):
+    """Load the replica, then keep it in sync until cancelled."""
+    reloaded_at = None
+    while True:
+        try:
+            if reloaded_at is None or time.monotonic() - reloaded_at >= REPLICA_FULL_RELOAD_INTERVAL:
+                await load_replica(client, name)
+                reloaded_at = time.monotonic()
+            else:
+                await sync_replica(client, name)
+        except Exception as e:
+            print('replica sync failed: ', e)
+        await asyncio.sleep(REPLICA_SYNC_INTERVAL)
+
+
+def reset_replica():
+    global _replica, _journal, _synced_at
+    _replica, _journal, _synced_at = None, None, 0.0
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import redis
+
+from config import SEARCH_CACHE_BACKEND, SEARCH_CACHE_MAX_ENTRIES, SEARCH_CACHE_TTL
+from core.embedding_cache import normalize_text
+from core.metrics import CACHE_REQUESTS
+from core.redis_client import get_async_redis, redis_enabled
+from qdrant_service.types import QuestionLimit, QASearchResult
+
+VERSION_KEY = 'search-cache:version:{collection}'
+RESULT_KEY = 'search-cache:result:{key}'
+
+class LocalVersions:
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+
+    async def get(self, collection: str) -> int:
+        return self._versions.get(collection, 0)
+
+    async def bump(self, collection: str):
+        self._versions[collection] = self._versions.get(collection, 0) + 1
+
+
+class RedisVersions:
+    """Collection versions shared by the API and the workers, whichever process writes."""
+
+    async def get(self, collection: str) -> int:
+        return int(await get_async_redis().get(VERSION_KEY.format(collection=collection)) or 0)
+
+    async def bump(self, collection: str):
+        await get_async_redis().incr(VERSION_KEY.format(collection=collection))
+
+
+class MemoryResults:
+    def __init__(self, max_entries: int = SEARCH_CACHE_MAX_ENTRIES, ttl: float = SEARCH_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, Tuple[List[QASearchResult], float]] = OrderedDict()
+
+    async def get(self, key: str) -> Optional[List[QASearchResult]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        results, stored_at = entry
+        if self.ttl > 0 and time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return results
+
+    async def put(self, key: str, results: List[QASearchResult]):
+        self._entries[key] = (results, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class RedisResults:
+    def __init__(self, ttl: float = SEARCH_CACHE_TTL):
+        self.ttl = ttl
+
+    async def get(self, key: str) -> Optional[List[QASearchResult]]:
+        raw = await get_async_redis().get(RESULT_KEY.format(key=key))
+        if raw is None:
+            return None
+        return [QASearchResult(**item) for item in json.loads(raw)]
+
+    async def put(self, key: str, results: List[QASearchResult]):
+        raw = json.dumps([r.model_dump() for r in results], ensure_ascii=False)
+        await get_async_redis().set(RESULT_KEY.format(key=key), raw, ex=int(self.ttl) or None)
+
+
+class SearchCache:
+    """
+    Search results keyed on the normalized query and the collection version.
+
+    Every write through QdrantService bumps the version, so results cached before
+    the write are simply never looked up again. ``ttl`` only bounds how long an
+    entry may survive a bump that failed to reach Redis.
+    """
+
+    def __init__(self, results, versions):
+        self.results = results
+        self.versions = versions
+
+    @staticmethod
+    def key(collection: str, version: int, data: QuestionLimit) -> str:
+        query = data.model_dump()
+        query['question'] = normalize_text(data.question)
+        digest = hashlib.sha1(json.dumps(query, sort_keys=True).encode()).hexdigest()
+        return f'{collection}:{version}:{digest}'
+
+    async def get(self, collection: str, data: QuestionLimit) -> Tuple[Optional[str], Optional[List[QASearchResult]]]:
+        """Return the key to store the fresh results under (None: don't cache) and the cached results."""
+        if self.results is None:
+            return None, None
+        try:
+            key = self.key(collection, await self.versions.get(collection), data)
+            results = await self.results.get(key)
+        except redis.RedisError as e:
+            print('search cache unavailable: ', e)
+            return None, None
+        CACHE_REQUESTS.labels('search', 'miss' if results is None else 'hit').inc()
+        return key, results
+
+    async def put(self, key: Optional[str], results: List[QASearchResult]):
+        if key is None:
+            return
+        try:
+            await self.results.put(key, results)
+        except redis.RedisError as e:
+            print('search cache unavailable: ', e)
+
+    async def bump(self, collection: str):
+        if self.results is None:
+            return
+        try:
+            await self.versions.bump(collection)
+        except redis.RedisError as e:
+            print('search cache version bump failed: ', e)
+
+
+_search_cache: Optional[SearchCache] = None
+
+
+def create_search_cache(backend: str = SEARCH_CACHE_BACKEND) -> SearchCache:
+    # Without Redis the version is only known to this process: fine for a single-process
+    # deployment, otherwise writes made by the workers are only noticed after the TTL.
+    versions = RedisVersions() if redis_enabled() else LocalVersions()
+    if backend == 'none':
+        return SearchCache(None, versions)
+    if backend == 'memory':
+        return SearchCache(MemoryResults(), versions)
+    if backend == 'redis':
+        return SearchCache(RedisResults(), RedisVersions())
+    raise ValueError(f'unknown search cache backend: {backend}')
+
+
+def get_search_cache() -> SearchCache:
+    global _search_cache
+    if _search_cache is None:
+        _search_cache = create_search_cache()
+    return _search_cache
+
+
+def reset_search_cache():
+    global _search_cache
+    _search_cache = None
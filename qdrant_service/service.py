@@ -1,12 +1,71 @@
-from typing import List, Optional, Union, Dict
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import List, Optional, Union, Dict, Callable, Awaitable, AsyncIterator, TypeVar, TYPE_CHECKING
 from uuid import uuid4
-from qdrant_client.http.models import Distance, VectorParams, PointStruct
+from qdrant_client.http.models import PointStruct, QueryRequest, Filter, FieldCondition, MatchValue, Range
 
 from qdrant_client import AsyncQdrantClient
-from qdrant_client.http.exceptions import UnexpectedResponse
-from sentence_transformers import SentenceTransformer
 
-from qdrant_service.types import QuestionAnswer, QuestionLimit, QASearchResult
+from config import EMBEDDING_MODEL_NAME, QDRANT_COLLECTION_CHECK_INTERVAL, QDRANT_ALIAS_SWITCH_TIMEOUT
+from core.embedding import get_embedding_engine
+from core.metrics import QDRANT_SECONDS, timed
+from qdrant_service.collection import (
+    create_aliased_collection,
+    alias_switch_pending,
+    wait_for_collection,
+    collection_model,
+    model_collection,
+    search_params,
+    is_not_found,
+    is_unreachable,
+    QDRANT_ERRORS,
+    QDRANT_UNREACHABLE_ERRORS,
+)
+from qdrant_service.dedup import near_duplicate_representatives
+from qdrant_service.replica import get_replica, replica_upsert, replica_delete
+from qdrant_service.search_cache import get_search_cache
+from qdrant_service.types import QuestionAnswer, QuestionLimit, QASearchResult, BatchSaveResult, PatternFilter
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+T = TypeVar("T")
+
+
+# Collections verified (or created) by this process, with the time of the check. Shared
+# by every QdrantService instance so reads pay the get_collection round-trip at most once
+# per QDRANT_COLLECTION_CHECK_INTERVAL, not per request.
+_ready_collections: Dict[str, float] = {}
+
+# Collections pinned by this process while its alias points at vectors of another model:
+# between a re-index switching the alias and the restart onto the new model, reads and
+# writes keep going to the collection encoded with this process's model.
+_pinned_collections: Dict[str, str] = {}
+
+
+def pattern_payload(data: QuestionAnswer) -> Dict:
+    payload = {"question": data.question, "answer": data.answer, "created_at": data.created_at or time.time()}
+    if data.chat_id is not None:
+        payload["chat_id"] = data.chat_id
+    if data.language is not None:
+        payload["language"] = data.language
+    return payload
+
+
+def pattern_filter(data: Optional[PatternFilter]) -> Optional[Filter]:
+    """Translate a PatternFilter into a Qdrant payload filter, or None if it filters nothing."""
+    if data is None:
+        return None
+    must = []
+    if data.chat_id is not None:
+        must.append(FieldCondition(key="chat_id", match=MatchValue(value=data.chat_id)))
+    if data.language is not None:
+        must.append(FieldCondition(key="language", match=MatchValue(value=data.language)))
+    if data.created_from is not None or data.created_to is not None:
+        must.append(FieldCondition(key="created_at", range=Range(gte=data.created_from, lt=data.created_to)))
+    return Filter(must=must) if must else None
 
 
 class QdrantService:
@@ -15,76 +74,284 @@ class QdrantService:
     def __init__(self, client: AsyncQdrantClient, model: SentenceTransformer):
         self.client = client
         self.model = model
-        self._collection_ready = False
+        self.encoder = get_embedding_engine(model)
 
-    async def _ensure_collection(self):
-        if self._collection_ready:
+    async def ensure_collection(self, recheck: bool = False):
+        checked_at = _ready_collections.get(self.COLLECTION_NAME)
+        if not recheck and checked_at is not None and time.monotonic() - checked_at < QDRANT_COLLECTION_CHECK_INTERVAL:
             return
         try:
-            await self.client.get_collection(collection_name=self.COLLECTION_NAME)
-        except UnexpectedResponse as e:
-            if e.status_code == 404:
-                await self.client.create_collection(
-                    self.COLLECTION_NAME,
-                    vectors_config=VectorParams(
-                        size=self.model.get_sentence_embedding_dimension(),
-                        distance=Distance.COSINE
-                    )
-                )
+            with timed(QDRANT_SECONDS.labels("get_collection")):
+                info = await self.client.get_collection(collection_name=self.COLLECTION_NAME)
+        except QDRANT_ERRORS as e:
+            if not is_not_found(e):
+                raise
+            if await alias_switch_pending(self.client, self.COLLECTION_NAME):
+                info = await wait_for_collection(self.client, self.COLLECTION_NAME, QDRANT_ALIAS_SWITCH_TIMEOUT)
             else:
+                await create_aliased_collection(
+                    self.client, self.COLLECTION_NAME, self.encoder.dimension(), EMBEDDING_MODEL_NAME
+                )
+                info = None
+        problem = self._incompatibility(info)
+        if problem is None:
+            _pinned_collections.pop(self.COLLECTION_NAME, None)
+        else:
+            pinned = await model_collection(
+                self.client, self.COLLECTION_NAME, EMBEDDING_MODEL_NAME, self.encoder.dimension()
+            )
+            if pinned is None:
+                raise RuntimeError(f"{problem}: restart it with the collection's model")
+            if _pinned_collections.get(self.COLLECTION_NAME) != pinned:
+                print(f'{problem}; using {pinned} until restarted with the new model')
+            _pinned_collections[self.COLLECTION_NAME] = pinned
+        _ready_collections[self.COLLECTION_NAME] = time.monotonic()
+
+    @property
+    def collection(self) -> str:
+        """The collection operations go to: COLLECTION_NAME, or the one pinned for this model."""
+        return _pinned_collections.get(self.COLLECTION_NAME, self.COLLECTION_NAME)
+
+    def _incompatibility(self, info) -> Optional[str]:
+        size = getattr(getattr(getattr(getattr(info, "config", None), "params", None), "vectors", None), "size", None)
+        if isinstance(size, int) and size != self.encoder.dimension():
+            return (
+                f"collection {self.COLLECTION_NAME} has vector size {size}, "
+                f"model produces {self.encoder.dimension()}"
+            )
+        # Same-size models produce incomparable vectors too, e.g. right after a re-index.
+        model = collection_model(info)
+        if model is not None and model != EMBEDDING_MODEL_NAME:
+            return f"collection {self.COLLECTION_NAME} is encoded with {model}, this process uses {EMBEDDING_MODEL_NAME}"
+        return None
+
+    async def _with_collection(self, name: str, operation: Callable[[], Awaitable[T]], write: bool = False) -> T:
+        # A write encoded with the wrong model would stay in the collection, so writes
+        # don't rely on the periodic check.
+        await self.ensure_collection(recheck=write)
+        try:
+            with timed(QDRANT_SECONDS.labels(name)):
+                return await operation()
+        except QDRANT_ERRORS as e:
+            if not is_not_found(e):
                 raise
-        self._collection_ready = True
+        # The collection disappeared since it was verified: recreate it and retry once.
+        _ready_collections.pop(self.COLLECTION_NAME, None)
+        await self.ensure_collection()
+        with timed(QDRANT_SECONDS.labels(name)):
+            return await operation()
+
+    async def _written(self, upserted: Optional[List[PointStruct]] = None, deleted: Optional[List[str]] = None):
+        # Results cached before the write must not be served again; the local replica
+        # (if any) sees the write right away instead of at the next sync.
+        if upserted:
+            replica_upsert(upserted)
+        if deleted:
+            replica_delete(deleted)
+        await get_search_cache().bump(self.collection)
 
     async def save_question_answer_pattern(self, data: QuestionAnswer):
         print('processing and saving text: ', data.question, '->', data.answer, '...')
-        await self._ensure_collection()
-        vector = self.model.encode(data.question, convert_to_numpy=True).tolist()
-        await self.client.upsert(
-            collection_name=self.COLLECTION_NAME,
-            points=[
-                PointStruct(
-                    id=str(uuid4()),
-                    vector=vector,
-                    payload={"question": data.question, "answer": data.answer}
-                )
-            ]
-        )
+        vector = (await self.encoder.encode(data.question)).tolist()
+        points = [
+            PointStruct(
+                id=str(uuid4()),
+                vector=vector,
+                payload=pattern_payload(data)
+            )
+        ]
+        await self._with_collection("upsert", lambda: self.client.upsert(
+            collection_name=self.collection,
+            points=points
+        ), write=True)
+        await self._written(upserted=points)
+
+    async def save_question_answer_patterns(self, items: List[QuestionAnswer], threshold: float) -> BatchSaveResult:
+        """
+        Save a batch of patterns, skipping those whose question already has a stored
+        match scoring at least ``threshold``. Near-duplicates inside the batch are
+        collapsed to their first occurrence before Qdrant is queried. Uses one batched
+        encode, one ``query_batch_points`` and one ``upsert`` for the whole batch.
+        """
+        result = BatchSaveResult()
+        if not items:
+            return result
+        encoded = await self.encoder.encode_many([item.question for item in items])
+        keep = near_duplicate_representatives(encoded, threshold)
+        kept = set(keep)
+        result.merged = [item for i, item in enumerate(items) if i not in kept]
+        items = [items[i] for i in keep]
+        vectors = [encoded[i].tolist() for i in keep]
+        responses = await self._with_collection("query_batch_points", lambda: self.client.query_batch_points(
+            collection_name=self.collection,
+            requests=[
+                QueryRequest(query=vector, limit=1, score_threshold=threshold, with_payload=False, params=search_params())
+                for vector in vectors
+            ],
+        ))
+        points = []
+        for item, vector, response in zip(items, vectors, responses):
+            if response.points and response.points[0].score >= threshold:
+                result.skipped.append(item)
+                continue
+            points.append(PointStruct(
+                id=str(uuid4()),
+                vector=vector,
+                payload=pattern_payload(item)
+            ))
+            result.saved.append(item)
+        if points:
+            await self._with_collection(
+                "upsert", lambda: self.client.upsert(collection_name=self.collection, points=points), write=True
+            )
+            await self._written(upserted=points)
+        return result
 
     async def delete_pattern_by_id(self, point_id: str):
-        await self._ensure_collection()
-        await self.client.delete(collection_name=self.COLLECTION_NAME, points_selector=[point_id])
+        await self._with_collection(
+            "delete", lambda: self.client.delete(collection_name=self.collection, points_selector=[point_id])
+        )
+        await self._written(deleted=[point_id])
 
 
     async def search_similar_questions(self, data: QuestionLimit)-> List[QASearchResult]:
-        await self._ensure_collection()
-        query_vector = self.model.encode(data.question, convert_to_numpy=True).tolist()
-        results = await self.client.query_points(
-            collection_name=self.COLLECTION_NAME,
+        cache_key, cached = await get_search_cache().get(self.collection, data)
+        if cached is not None:
+            return cached
+        query_filter = pattern_filter(data.filter)
+        replica = get_replica()
+        # The replica mirrors COLLECTION_NAME, which a pinned process must not search.
+        if replica is not None and query_filter is None and self.collection == self.COLLECTION_NAME:
+            # Not cached: the replica may lag behind the version bumped by a remote
+            # writer, and the stale answer would outlive its next sync.
+            return await self._search_replica(replica, data)
+        query_vector = (await self.encoder.encode(data.question)).tolist()
+        results = await self._with_collection("query_points", lambda: self.client.query_points(
+            collection_name=self.collection,
             query=query_vector,
             limit=data.limit,
-            with_payload=True
+            score_threshold=data.score_threshold,
+            query_filter=query_filter,
+            with_payload=data.with_payload,
+            search_params=search_params(),
+        ))
+        hits = self._to_search_results(results.points)
+        await get_search_cache().put(cache_key, hits)
+        return hits
+
+    async def _search_replica(self, replica, data: QuestionLimit) -> List[QASearchResult]:
+        vector = await self.encoder.encode(data.question)
+        found = await asyncio.get_running_loop().run_in_executor(
+            None, replica.search, vector, data.limit, data.score_threshold
         )
+        hits = []
+        for point_id, score, payload in found:
+            if data.with_payload is False:
+                payload = {}
+            elif data.with_payload is not True:
+                payload = {k: v for k, v in payload.items() if k in data.with_payload}
+            hits.append(QASearchResult(
+                question=payload.get("question"), answer=payload.get("answer"), score=score, uuid=str(point_id)
+            ))
+        return hits
+
+    async def find_duplicate(
+        self, question: str, threshold: float, filter: Optional[PatternFilter] = None,
+        with_payload: Union[bool, List[str]] = False,
+    ) -> Optional[QASearchResult]:
+        """
+        Return the best stored match scoring at least ``threshold``, or None. Only the
+        top id and score come back unless ``with_payload`` asks for more.
+        """
+        hits = await self.search_similar_questions(QuestionLimit(
+            question=question, limit=1, score_threshold=threshold, filter=filter, with_payload=with_payload,
+        ))
+        return hits[0] if hits else None
+
+    async def search_similar_questions_batch(self, items: List[QuestionLimit]) -> List[List[QASearchResult]]:
+        """Answer several searches with one batched encode and one ``query_batch_points``, in input order."""
+        if not items:
+            return []
+        vectors = await self.encoder.encode_many([item.question for item in items])
+        responses = await self._with_collection("query_batch_points", lambda: self.client.query_batch_points(
+            collection_name=self.collection,
+            requests=[
+                QueryRequest(
+                    query=vector.tolist(),
+                    limit=item.limit,
+                    score_threshold=item.score_threshold,
+                    filter=pattern_filter(item.filter),
+                    with_payload=item.with_payload,
+                    params=search_params(),
+                )
+                for item, vector in zip(items, vectors)
+            ],
+        ))
+        return [self._to_search_results(response.points) for response in responses]
+
+    @staticmethod
+    def _to_search_results(points) -> List[QASearchResult]:
         return [
             QASearchResult(
-                question=p.payload.get("question"),
-                answer=p.payload.get("answer"),
+                question=(p.payload or {}).get("question"),
+                answer=(p.payload or {}).get("answer"),
                 score=p.score,
-                uuid=p.id
+                uuid=str(p.id)
             )
-        for p in results.points
+        for p in points
     ]
 
     async def get_all_texts(self, limit: int, cursor: Optional[Union[int, str]]) -> Dict[str, object]:
-        await self._ensure_collection()
-        points, next_cursor = await self.client.scroll(
-            collection_name=self.COLLECTION_NAME,
+        points, next_cursor = await self._with_collection("scroll", lambda: self.client.scroll(
+            collection_name=self.collection,
             limit=limit,
             offset=cursor,
             with_payload=True,
             with_vectors=False
-        )
+        ))
         items: List[Dict[str, object]] = [
             {"id": p.id, "question": p.payload.get("question"), "answer": p.payload.get("answer")}
             for p in points
         ]
-        return {"items": items, "next": next_cursor}
\ No newline at end of file
+        return {"items": items, "next": next_cursor}
+
+    async def iter_points(self, batch_size: int, with_vectors: bool = False) -> AsyncIterator[List]:
+        """Scroll through the whole collection, ``batch_size`` points per round-trip."""
+        offset = None
+        while True:
+            points, offset = await self._with_collection("scroll", lambda: self.client.scroll(
+                collection_name=self.collection,
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=with_vectors,
+            ))
+            if points:
+                yield points
+            if offset is None:
+                return
+
+    async def import_points(self, records: List[Dict]) -> int:
+        """Upsert exported records (id, payload, optional vector); missing vectors are encoded."""
+        missing = [i for i, r in enumerate(records) if r.get("vector") is None]
+        encoded = await self.encoder.encode_many([records[i]["payload"]["question"] for i in missing]) if missing else []
+        vectors = {i: vector.tolist() for i, vector in zip(missing, encoded)}
+        points = [
+            PointStruct(id=r.get("id") or str(uuid4()), vector=vectors.get(i, r.get("vector")), payload=r["payload"])
+            for i, r in enumerate(records)
+        ]
+        await self._with_collection(
+            "upsert", lambda: self.client.upsert(collection_name=self.collection, points=points, wait=True), write=True
+        )
+        await self._written(upserted=points)
+        return len(points)
+
+
+async def prepare_collection(client: AsyncQdrantClient, model: SentenceTransformer):
+    """Verify the collection once at process start; an unreachable Qdrant is retried lazily."""
+    try:
+        await QdrantService(client, model).ensure_collection()
+    except QDRANT_UNREACHABLE_ERRORS as e:
+        if not is_unreachable(e):
+            raise
+        print('qdrant is unreachable, collection check deferred: ', e)
@@ -0,0 +1,111 @@
+import asyncio
+import json
+from typing import AsyncIterator, Dict, List, Set
+
+from config import EXPORT_BATCH_SIZE, IMPORT_BATCH_SIZE, IMPORT_PARALLELISM
+from qdrant_service.service import QdrantService, pattern_payload
+from qdrant_service.types import QuestionAnswer
+
+# Line numbers of rejected records reported back to the client; the rest are only counted.
+MAX_REPORTED_ERRORS = 100
+
+
+async def export_ndjson(
+    service: QdrantService, with_vectors: bool = False, batch_size: int = EXPORT_BATCH_SIZE
+) -> AsyncIterator[bytes]:
+    """One ``{"id", "payload"[, "vector"]}`` JSON line per stored pattern."""
+    async for points in service.iter_points(batch_size, with_vectors=with_vectors):
+        lines = []
+        for p in points:
+            record = {"id": p.id, "payload": p.payload}
+            if with_vectors:
+                record["vector"] = p.vector
+            lines.append(json.dumps(record, ensure_ascii=False))
+        yield ("\n".join(lines) + "\n").encode()
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+
+def parse_record(line: bytes, dimension: int) -> Dict:
+    """
+    Accept an exported line, or a bare ``{"question", "answer", ...}`` object. Raises
+    ValueError for anything that cannot be stored.
+    """
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError("not an object")
+    if "payload" not in record:
+        fields = {k: v for k, v in record.items() if k not in ("id", "vector")}
+        record = {"id": record.get("id"), "vector": record.get("vector"), "payload": pattern_payload(QuestionAnswer(**fields))}
+    payload = record["payload"]
+    if not isinstance(payload, dict) or not isinstance(payload.get("question"), str):
+        raise ValueError("payload.question is missing")
+    vector = record.get("vector")
+    if vector is not None and len(vector) != dimension:
+        raise ValueError(f"vector size {len(vector)} != {dimension}")
+    return record
+
+
+async def import_ndjson(
+    service: QdrantService,
+    chunks: AsyncIterator[bytes],
+    batch_size: int = IMPORT_BATCH_SIZE,
+    parallelism: int = IMPORT_PARALLELISM,
+) -> AsyncIterator[Dict]:
+    """
+    Upsert an NDJSON stream in batches of ``batch_size``, keeping up to ``parallelism``
+    upserts in flight. Yields a progress report after every finished batch and a final
+    one with ``done`` set.
+    """
+    await service.ensure_collection()
+    dimension = service.encoder.dimension()
+    progress = {"imported": 0, "failed": 0, "rejected": 0, "error_lines": []}
+    in_flight: Set[asyncio.Task] = set()
+
+    async def store(batch: List[Dict]):
+        try:
+            stored = await service.import_points(batch)
+        except Exception as e:
+            print('pattern import batch failed: ', e)
+            progress["failed"] += len(batch)
+        else:
+            progress["imported"] += stored
+
+    async def finish(tasks: Set[asyncio.Task]) -> Dict:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        in_flight.difference_update(done)
+        return {k: v for k, v in progress.items() if k != "error_lines"}
+
+    batch: List[Dict] = []
+    line_number = 0
+    async for line in iter_lines(chunks):
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            batch.append(parse_record(line, dimension))
+        except (ValueError, TypeError, KeyError) as e:
+            progress["rejected"] += 1
+            if len(progress["error_lines"]) < MAX_REPORTED_ERRORS:
+                progress["error_lines"].append({"line": line_number, "error": str(e)})
+            continue
+        if len(batch) >= batch_size:
+            in_flight.add(asyncio.create_task(store(batch)))
+            batch = []
+            while len(in_flight) >= parallelism:
+                yield await finish(in_flight)
+    if batch:
+        in_flight.add(asyncio.create_task(store(batch)))
+    while in_flight:
+        yield await finish(in_flight)
+    print(f'pattern import: {progress["imported"]} imported, {progress["failed"]} failed, {progress["rejected"]} rejected')
+    yield {**progress, "done": True}
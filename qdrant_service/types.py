@@ -1,16 +1,33 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class QuestionAnswer(BaseModel):
     question: str
     answer: str
+    chat_id: str | None = None
+    language: str | None = None
+    created_at: float | None = None
+
+class PatternFilter(BaseModel):
+    chat_id: str | None = None
+    language: str | None = None
+    created_from: float | None = None
+    created_to: float | None = None
 
 class QuestionLimit(BaseModel):
-    limit: int = 5
+    limit: int = Field(5, gt=0, le=100)
     question: str
+    score_threshold: float | None = None
+    filter: PatternFilter | None = None
+    with_payload: bool | list[str] = True
 
 class QASearchResult(BaseModel):
     question: str | None
     answer: str | None
     score: float
     uuid: str
+
+class BatchSaveResult(BaseModel):
+    saved: list[QuestionAnswer] = []
+    skipped: list[QuestionAnswer] = []
+    merged: list[QuestionAnswer] = []
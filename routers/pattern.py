@@ -1,16 +1,25 @@
-from typing import List, Optional, Union
+from __future__ import annotations
 
-from fastapi import APIRouter, Depends, Body, Response, status
+from typing import List, Optional, Union, TYPE_CHECKING
+
+from fastapi import APIRouter, Depends, Body, Request, Response, status
+from fastapi.responses import StreamingResponse
 from fastapi.params import Query
 from qdrant_client import AsyncQdrantClient
-from sentence_transformers import SentenceTransformer
 
 from deps import get_embedding_model
 from qdrant_service.base import get_qdrant_client
 from qdrant_service.service import QdrantService
-from qdrant_service.types import QuestionLimit, QuestionAnswer, QASearchResult
-from schemas import QADetailsSchema, QASchemaWithForceSave
-from celery_app.tasks import daily_task
+from qdrant_service.transfer import export_ndjson, import_ndjson
+from qdrant_service.types import QuestionLimit, QuestionAnswer, QASearchResult, PatternFilter
+from schemas import QADetailsSchema, QASchemaWithForceSave, SearchBatchSchema
+from celery_app import celery_app
+from celery_app.notifications import notify
+from config import EXPORT_BATCH_SIZE, DUPLICATE_SCORE_THRESHOLD
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
 pattern_router = APIRouter()
 
 @pattern_router.post("", response_model=QADetailsSchema)
@@ -21,10 +30,12 @@ async def add_new_pattern(
     response: Response = None
 ) -> QADetailsSchema:
     service = QdrantService(client, model)
-    result = await service.search_similar_questions(QuestionLimit(question=data.question))
+    hit = None
+    if not data.force_save:
+        hit = await service.find_duplicate(data.question, DUPLICATE_SCORE_THRESHOLD, with_payload=["question", "answer"])
 
-    if result and not data.force_save and result[0].score > 0.68:
-        hit = result[0]
+    # Strictly above: a score equal to the threshold is saved (workers skip it).
+    if hit and hit.score > DUPLICATE_SCORE_THRESHOLD:
         response.status_code = status.HTTP_400_BAD_REQUEST
         return QADetailsSchema(
             question=hit.question,
@@ -45,9 +56,27 @@ async def get_answer_by_question(
     client: AsyncQdrantClient = Depends(get_qdrant_client),
     model: SentenceTransformer = Depends(get_embedding_model),
     question: str = Query(...),
+    score_threshold: Optional[float] = Query(None),
+    chat_id: Optional[str] = Query(None),
+    language: Optional[str] = Query(None),
+    created_from: Optional[float] = Query(None),
+    created_to: Optional[float] = Query(None),
 ) -> List[QASearchResult]:
     service = QdrantService(client, model)
-    return await service.search_similar_questions(QuestionLimit(question=question))
+    return await service.search_similar_questions(QuestionLimit(
+        question=question,
+        score_threshold=score_threshold,
+        filter=PatternFilter(chat_id=chat_id, language=language, created_from=created_from, created_to=created_to),
+    ))
+
+@pattern_router.post("/search-batch", response_model=List[List[QASearchResult]])
+async def search_batch(
+    data: SearchBatchSchema = Body(...),
+    client: AsyncQdrantClient = Depends(get_qdrant_client),
+    model: SentenceTransformer = Depends(get_embedding_model),
+) -> List[List[QASearchResult]]:
+    service = QdrantService(client, model)
+    return await service.search_similar_questions_batch(data.questions)
 
 @pattern_router.delete("")
 async def delete_pattern(
@@ -61,7 +90,7 @@ async def delete_pattern(
 
 @pattern_router.post("/start-task")
 async def start_task():
-    daily_task.delay()
+    celery_app.send_task('celery_app.tasks.daily_task')
     return {'details': 'started'}
 
 @pattern_router.get("/get-all-texts")
@@ -74,3 +103,33 @@ async def get_all_texts(
     service = QdrantService(client, model)
     return await service.get_all_texts(limit=limit, cursor=cursor)
 
+
+@pattern_router.get("/export")
+async def export_patterns(
+    with_vectors: bool = Query(False),
+    batch_size: int = Query(EXPORT_BATCH_SIZE, gt=0, le=10000),
+    client: AsyncQdrantClient = Depends(get_qdrant_client),
+    model: SentenceTransformer = Depends(get_embedding_model),
+):
+    service = QdrantService(client, model)
+    return StreamingResponse(export_ndjson(service, with_vectors, batch_size), media_type="application/x-ndjson")
+
+@pattern_router.post("/import")
+async def import_patterns(
+    request: Request,
+    client: AsyncQdrantClient = Depends(get_qdrant_client),
+    model: SentenceTransformer = Depends(get_embedding_model),
+):
+    # The upload is consumed here rather than inside a streaming response, whose
+    # disconnect listener would compete with us for the request body.
+    service = QdrantService(client, model)
+    report = {}
+    async for report in import_ndjson(service, request.stream()):
+        if not report.get("done"):
+            await notify(
+                f"<b>Импорт</b>: 📥 сохранено <b>{report['imported']}</b>, ошибок: <b>{report['failed'] + report['rejected']}</b>",
+                key="pattern-import:progress",
+            )
+    await notify(f"<b>Импорт</b>: ✅ сохранено <b>{report['imported']}</b>, ошибок: <b>{report['failed'] + report['rejected']}</b>",
+                 key="pattern-import:progress")
+    return report
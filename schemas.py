@@ -1,4 +1,9 @@
-from pydantic import BaseModel
+from typing import List
+
+from pydantic import BaseModel, Field
+
+from config import SEARCH_BATCH_MAX_ITEMS
+from qdrant_service.types import QuestionLimit
 
 
 class QuestionAnswerSchema(BaseModel):
@@ -9,4 +14,7 @@ class QASchemaWithForceSave(QuestionAnswerSchema):
     force_save: bool = False
 
 class QADetailsSchema(QuestionAnswerSchema):
-    details: str
\ No newline at end of file
+    details: str
+
+class SearchBatchSchema(BaseModel):
+    questions: List[QuestionLimit] = Field(..., max_length=SEARCH_BATCH_MAX_ITEMS)
@@ -0,0 +1,91 @@
+from typing import Dict, List
+
+from hypothesis import given, settings, strategies as st
+
+from celery_app.proccess_chat import build_chunks, ChunkBuilder
+
+
+def legacy_build_chunks(messages: List[Dict], chunk_size: int) -> List[List[Dict]]:
+    """The original implementation, kept as the reference for chunk boundaries."""
+    chunks: List[List[Dict]] = []
+    current: List[Dict] = []
+    current_len = 0
+    for msg in messages:
+        seg = f'{msg["sender"]}: {msg["message_text"]}\n'
+        current.append(msg)
+        current_len += len(seg)
+        if current_len >= chunk_size and msg["sender"].lower() == "staff":
+            chunks.append(current)
+            current = []
+            current_len = 0
+    if current:
+        if current[-1]["sender"].lower() == "staff":
+            chunks.append(current)
+        else:
+            last_staff_index = -1
+            for idx in range(len(current) - 1, -1, -1):
+                if current[idx]["sender"].lower() == "staff":
+                    last_staff_index = idx
+                    break
+            if last_staff_index != -1:
+                chunks.append(current[:last_staff_index + 1])
+                remaining = current[last_staff_index + 1:]
+                if remaining:
+                    if remaining[-1]["sender"].lower() == "staff":
+                        chunks.append(remaining)
+                    else:
+                        for msg in messages[messages.index(remaining[-1]) + 1:]:
+                            remaining.append(msg)
+                            if msg["sender"].lower() == "staff":
+                                break
+                        chunks.append(remaining)
+            else:
+                for msg in messages[messages.index(current[0]):]:
+                    current.append(msg)
+                    if msg["sender"].lower() == "staff":
+                        break
+                chunks.append(current)
+    return chunks
+
+
+senders = st.sampled_from(["staff", "Staff", "client", "bot"])
+chats = st.lists(st.tuples(senders, st.text(max_size=60)), max_size=80).map(
+    # The running index keeps messages distinct, the only case the legacy code handles.
+    lambda items: [{"id": i, "sender": s, "message_text": t} for i, (s, t) in enumerate(items)]
+)
+chunk_sizes = st.integers(min_value=1, max_value=400)
+
+
+@settings(max_examples=200)
+@given(chats, chunk_sizes)
+def test_matches_legacy_boundaries(messages, chunk_size):
+    expected = legacy_build_chunks(messages, chunk_size)
+    if expected:
+        half = len(expected[-1]) // 2
+        if expected[-1][:half] == expected[-1][half:]:
+            # The legacy code appended a staff-less tail to itself; it is emitted once now.
+            expected[-1] = expected[-1][:half]
+    assert build_chunks(messages, chunk_size) == expected
+
+
+@settings(max_examples=200)
+@given(chats, chunk_sizes)
+def test_every_message_lands_in_exactly_one_chunk(messages, chunk_size):
+    chunks = build_chunks(messages, chunk_size)
+    assert [m for chunk in chunks for m in chunk] == messages
+    assert all(chunks)
+
+
+@settings(max_examples=200)
+@given(chats, chunk_sizes)
+def test_chunk_builder_agrees_with_build_chunks(messages, chunk_size):
+    builder = ChunkBuilder(chunk_size)
+    chunks = [chunk for chunk in map(builder.add, messages) if chunk is not None]
+    assert chunks + builder.finish() == build_chunks(messages, chunk_size)
+
+
+def test_duplicate_messages_are_not_rescanned():
+    msg_client = {"sender": "client", "message_text": "same"}
+    msg_staff = {"sender": "staff", "message_text": "reply"}
+    messages = [msg_client, msg_staff, dict(msg_client), dict(msg_staff), dict(msg_client)]
+    assert build_chunks(messages, 10_000) == [messages[:4], messages[4:]]
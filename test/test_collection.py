@@ -0,0 +1,79 @@
+import pytest
+import pytest_asyncio
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http.models import PointStruct, ScalarQuantization, BinaryQuantization
+
+from qdrant_service import collection
+from qdrant_service.collection import (
+    create_collection,
+    create_aliased_collection,
+    collection_model,
+    migrate_collection,
+    resolve_alias,
+)
+
+
+@pytest_asyncio.fixture
+async def local_client():
+    client = AsyncQdrantClient(location=":memory:")
+    yield client
+    await client.close()
+
+
+def test_quantization_and_search_params_follow_settings(monkeypatch):
+    assert collection.quantization_config() is None
+    assert collection.search_params() is None
+
+    monkeypatch.setattr(collection, "QDRANT_QUANTIZATION", "scalar")
+    monkeypatch.setattr(collection, "QDRANT_SEARCH_HNSW_EF", 128)
+    assert isinstance(collection.quantization_config(), ScalarQuantization)
+    params = collection.search_params()
+    assert params.hnsw_ef == 128
+    assert params.quantization.rescore is True
+
+    monkeypatch.setattr(collection, "QDRANT_QUANTIZATION", "binary")
+    assert isinstance(collection.quantization_config(), BinaryQuantization)
+
+
+def test_payload_indexes_are_parsed(monkeypatch):
+    monkeypatch.setattr(collection, "QDRANT_PAYLOAD_INDEXES", "chat_id:integer, language:keyword")
+    assert [(f, s.value) for f, s in collection.payload_indexes()] == [("chat_id", "integer"), ("language", "keyword")]
+
+
+@pytest.mark.asyncio
+async def test_migration_copies_points_behind_an_alias(local_client, monkeypatch):
+    await create_collection(local_client, "patterns", 3)
+    await local_client.upsert("patterns", points=[
+        PointStruct(id=i, vector=[1.0, float(i), 0.0], payload={"question": f"q{i}"}) for i in range(5)
+    ])
+    monkeypatch.setattr(collection, "QDRANT_VECTORS_ON_DISK", True)
+
+    first = await migrate_collection(local_client, "patterns", batch_size=2)
+    assert await resolve_alias(local_client, "patterns") == first
+    assert (await local_client.count("patterns")).count == 5
+
+    second = await migrate_collection(local_client, "patterns", batch_size=2, drop_old=True)
+    assert await resolve_alias(local_client, "patterns") == second
+    assert not await local_client.collection_exists(first)
+    points, _ = await local_client.scroll("patterns", limit=10)
+    assert sorted(p.payload["question"] for p in points) == [f"q{i}" for i in range(5)]
+
+
+def test_collections_created_in_the_same_second_get_distinct_names(monkeypatch):
+    monkeypatch.setattr(collection.time, "time", lambda: 4102444800)
+    first, second = collection.new_collection_name("patterns"), collection.new_collection_name("patterns")
+    assert first != second
+    assert first.startswith("patterns_4102444800_") and second.startswith("patterns_4102444800_")
+
+
+@pytest.mark.asyncio
+async def test_new_collection_is_created_behind_an_alias_with_its_model(local_client):
+    target = await create_aliased_collection(local_client, "patterns", 3, "model-a")
+    assert target.startswith("patterns_")
+    assert await resolve_alias(local_client, "patterns") == target
+    assert collection_model(await local_client.get_collection("patterns")) == "model-a"
+
+    # Already aliased: the migration swaps the alias without deleting anything first.
+    migrated = await migrate_collection(local_client, "patterns")
+    assert await local_client.collection_exists(target)
+    assert collection_model(await local_client.get_collection(migrated)) == "model-a"
@@ -0,0 +1,116 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from core.embedding import EmbeddingEngine
+from core.embedding_cache import EmbeddingCache
+
+
+class RecordingModel:
+    def __init__(self, dim: int = 3):
+        self.dim = dim
+        self.calls = []
+
+    def encode(self, texts, convert_to_numpy=True, **kwargs):
+        self.calls.append(list(texts))
+        return [[float(len(t))] * self.dim for t in texts]
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+
+@pytest.mark.asyncio
+async def test_concurrent_encodes_are_batched():
+    model = RecordingModel()
+    engine = EmbeddingEngine(model, max_batch_size=16, max_wait_ms=20)
+    texts = ["a", "bb", "ccc", "dddd"]
+    vectors = await asyncio.gather(*(engine.encode(t) for t in texts))
+    assert model.calls == [texts]
+    assert [v.tolist() for v in vectors] == [[1.0] * 3, [2.0] * 3, [3.0] * 3, [4.0] * 3]
+
+
+@pytest.mark.asyncio
+async def test_batch_is_split_at_max_batch_size():
+    model = RecordingModel()
+    engine = EmbeddingEngine(model, max_batch_size=2, max_wait_ms=20)
+    await engine.encode_many(["a", "b", "c", "d", "e"])
+    assert [len(c) for c in model.calls] == [2, 2, 1]
+
+
+@pytest.mark.asyncio
+async def test_encode_errors_propagate_to_every_caller():
+    class FailingModel(RecordingModel):
+        def encode(self, texts, convert_to_numpy=True, **kwargs):
+            raise RuntimeError("boom")
+
+    engine = EmbeddingEngine(FailingModel(), max_wait_ms=1)
+    results = await asyncio.gather(engine.encode("a"), engine.encode("b"), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_cached_text_skips_model():
+    model = RecordingModel()
+    engine = EmbeddingEngine(model, model_name="m", cache=EmbeddingCache(), max_wait_ms=1)
+    first = await engine.encode("How  are you?")
+    second = await engine.encode("how are YOU?")
+    assert model.calls == [["How  are you?"]]
+    assert second.tolist() == first.tolist()
+    assert engine.cache.stats()["hits"] == 1
+
+
+def test_cache_evicts_least_recently_used():
+    cache = EmbeddingCache(max_entries=2)
+    vector = np.zeros(4, dtype=np.float32)
+    cache.put("m", "a", vector)
+    cache.put("m", "b", vector)
+    assert cache.get("m", "a") is not None
+    cache.put("m", "c", vector)
+    assert cache.get("m", "b") is None
+    assert cache.get("m", "a") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_respects_byte_bound_and_model_name():
+    vector = np.zeros(384, dtype=np.float32)
+    cache = EmbeddingCache(max_bytes=2 * (vector.nbytes + 300))
+    for text in ("a", "b", "c"):
+        cache.put("m", text, vector)
+    assert cache.stats()["entries"] == 2
+    assert cache.get("other", "c") is None
+
+
+def test_cache_ttl_expires_entries(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("core.embedding_cache.time.monotonic", lambda: now[0])
+    cache = EmbeddingCache(ttl=10)
+    cache.put("m", "a", np.ones(2, dtype=np.float32))
+    now[0] += 11
+    assert cache.get("m", "a") is None
+
+
+@pytest.fixture
+def loaded(monkeypatch):
+    import sentence_transformers
+    from qdrant_service import base
+
+    calls = []
+    monkeypatch.setattr(sentence_transformers, "SentenceTransformer", lambda path, **kwargs: calls.append((path, kwargs)))
+    monkeypatch.setattr(base, "EMBEDDING_MODEL_NAME", "old-model")
+    monkeypatch.setattr(base, "EMBEDDING_MODEL_DIR", "/models/old-model-onnx")
+    return calls
+
+
+def test_onnx_backend_loads_the_exported_configured_model(loaded):
+    from qdrant_service.base import get_model
+
+    get_model("onnx", "old-model")
+    assert loaded == [("/models/old-model-onnx", {"backend": "onnx"})]
+
+
+def test_other_model_is_not_loaded_from_the_export_dir(loaded):
+    from qdrant_service.base import get_model
+
+    get_model("onnx-int8", "new-model")
+    assert loaded == [("new-model", {})]
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from celery_app.event_loop import start_loop, run_async, stop_loop
+
+
+@pytest.fixture
+def worker_loop():
+    yield start_loop()
+    stop_loop()
+
+
+def test_tasks_share_one_running_loop(worker_loop):
+    async def current_loop():
+        return asyncio.get_running_loop()
+
+    assert run_async(current_loop()) is worker_loop
+    assert run_async(current_loop()) is worker_loop
+    assert worker_loop.is_running()
+
+
+def test_background_work_continues_between_tasks(worker_loop):
+    ticks = []
+
+    async def ticker():
+        while True:
+            ticks.append(1)
+            await asyncio.sleep(0.005)
+
+    async def spawn():
+        return asyncio.create_task(ticker())
+
+    task = run_async(spawn())
+    before = len(ticks)
+    run_async(asyncio.sleep(0.05))
+    assert len(ticks) > before
+    worker_loop.call_soon_threadsafe(task.cancel)
+
+
+def test_timeout_cancels_coroutine(worker_loop):
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    with pytest.raises(TimeoutError):
+        run_async(slow(), timeout=0.05)
+    run_async(asyncio.sleep(0.01))
+    assert cancelled == [True]
+
+
+def test_stop_runs_cleanup_and_closes_loop():
+    loop = start_loop()
+    closed = []
+
+    async def cleanup():
+        closed.append(True)
+
+    stop_loop(cleanup())
+    assert closed == [True]
+    assert loop.is_closed()
@@ -0,0 +1,70 @@
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+
+import external_service
+
+
+@pytest.fixture
+def transport(monkeypatch):
+    responses = []
+    seen = []
+
+    def handler(request: httpx.Request):
+        seen.append(request)
+        result = responses.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(external_service, "get_http_client", lambda: client)
+    monkeypatch.setattr(external_service, "HTTP_BACKOFF_BASE", 0)
+    monkeypatch.setattr(external_service, "_breakers", {})
+    return responses, seen
+
+
+@pytest.mark.asyncio
+async def test_retries_retriable_status_then_succeeds(transport):
+    responses, seen = transport
+    responses += [httpx.Response(503), httpx.Response(200, json={"ok": True})]
+    labels = {"base_url": "http://manager/"}
+    retries = REGISTRY.get_sample_value("http_request_retries_total", labels) or 0
+    calls = REGISTRY.get_sample_value("http_request_seconds_count", labels) or 0
+    result = await external_service.make_request("chats", base_url="http://manager/")
+    assert result["status"] == 200
+    assert result["body"] == {"ok": True}
+    assert len(seen) == 2
+    assert REGISTRY.get_sample_value("http_request_retries_total", labels) == retries + 1
+    assert REGISTRY.get_sample_value("http_request_seconds_count", labels) == calls + 1
+
+
+@pytest.mark.asyncio
+async def test_does_not_retry_client_errors(transport):
+    responses, seen = transport
+    responses += [httpx.Response(404, json={"detail": "no"})]
+    result = await external_service.make_request("chats", base_url="http://manager/")
+    assert result["status"] == 404
+    assert len(seen) == 1
+
+
+@pytest.mark.asyncio
+async def test_transport_errors_exhaust_attempts(transport):
+    responses, seen = transport
+    responses += [httpx.ConnectError("down")] * external_service.HTTP_MAX_ATTEMPTS
+    result = await external_service.make_request("chats", base_url="http://manager/")
+    assert result["status"] == 500
+    assert len(seen) == external_service.HTTP_MAX_ATTEMPTS
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_short_circuits_calls(transport):
+    responses, seen = transport
+    breaker = external_service.get_breaker("http://manager/")
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    result = await external_service.make_request("chats", base_url="http://manager/")
+    assert result["status"] == 503
+    assert seen == []
+    other = external_service.get_breaker("http://ai/")
+    assert other.allow()
@@ -0,0 +1,138 @@
+import json
+
+import pytest
+
+from celery_app import notifications
+from celery_app.notifications import coalesce, build_digests, flush_notifications, NOTIFICATIONS_KEY
+
+
+class FakeLock:
+    def acquire(self):
+        return True
+
+    def release(self):
+        pass
+
+
+class FakePipeline:
+    def __init__(self, store):
+        self.store = store
+        self.ops = []
+
+    def lrange(self, key, start, end):
+        self.ops.append(lambda: self.store.setdefault(key, [])[start:end + 1])
+
+    def ltrim(self, key, start, end):
+        def trim():
+            self.store[key] = self.store.get(key, [])[start:]
+            return True
+        self.ops.append(trim)
+
+    def execute(self):
+        return [op() for op in self.ops]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.store = {}
+
+    def rpush(self, key, *values):
+        self.store.setdefault(key, []).extend(values)
+
+    def lpush(self, key, *values):
+        for value in values:
+            self.store.setdefault(key, []).insert(0, value)
+
+    def pipeline(self):
+        return FakePipeline(self.store)
+
+    def lock(self, name, timeout=None, blocking=True):
+        return FakeLock()
+
+
+class AsyncFakeRedis:
+    """What notify() sees: the async client over the same store the flush drains."""
+
+    def __init__(self, sync: FakeRedis):
+        self.sync = sync
+
+    async def rpush(self, key, *values):
+        self.sync.rpush(key, *values)
+
+
+def _use_fake_redis(monkeypatch) -> FakeRedis:
+    fake = FakeRedis()
+    monkeypatch.setattr(notifications, "redis_enabled", lambda: True)
+    monkeypatch.setattr(notifications, "get_redis", lambda: fake)
+    monkeypatch.setattr(notifications, "get_async_redis", lambda: AsyncFakeRedis(fake))
+    return fake
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, chat_id, text, parse_mode=None):
+        self.sent.append(text)
+
+
+def test_coalesce_keeps_latest_keyed_event_and_counts_repeats():
+    events = [
+        {"text": "chunk 1", "key": "chat:1"},
+        {"text": "found 0", "key": None},
+        {"text": "chunk 2", "key": "chat:1"},
+        {"text": "found 0", "key": None},
+        {"text": "other", "key": "chat:2"},
+    ]
+    assert coalesce(events) == ["found 0 ×2", "chunk 2", "other"]
+
+
+def test_build_digests_respects_length_limit():
+    digests = build_digests(["a" * 6, "b" * 6, "c" * 3], limit=10)
+    assert digests == [["a" * 6], ["b" * 6, "c" * 3]]
+
+
+@pytest.mark.asyncio
+async def test_flush_sends_digests_and_requeues_over_budget(monkeypatch):
+    fake = _use_fake_redis(monkeypatch)
+    monkeypatch.setattr(notifications, "NOTIFY_MAX_MESSAGES_PER_FLUSH", 1)
+    monkeypatch.setattr(notifications, "build_digests", lambda lines: build_digests(lines, limit=10))
+    for text in ["first", "second", "third"]:
+        await notifications.notify(text)
+
+    bot = FakeBot()
+    assert flush_notifications(bot) == 1
+    assert bot.sent == ["first"]
+    assert [json.loads(e)["text"] for e in fake.store[NOTIFICATIONS_KEY]] == ["second", "third"]
+
+
+@pytest.mark.asyncio
+async def test_flush_requeues_drained_events_on_network_error(monkeypatch):
+    fake = _use_fake_redis(monkeypatch)
+    monkeypatch.setattr(notifications, "NOTIFY_MESSAGE_INTERVAL", 0)
+    monkeypatch.setattr(notifications, "build_digests", lambda lines: build_digests(lines, limit=10))
+    for text in ["first", "second", "third"]:
+        await notifications.notify(text)
+
+    bot = FakeBot()
+    send = bot.send_message
+
+    def flaky_send(chat_id, text, parse_mode=None):
+        if text == "second":
+            raise ConnectionError("connection reset")
+        send(chat_id, text, parse_mode)
+
+    bot.send_message = flaky_send
+    assert flush_notifications(bot) == 1
+    assert bot.sent == ["first"]
+    assert [json.loads(e)["text"] for e in fake.store[NOTIFICATIONS_KEY]] == ["second", "third"]
+
+
+@pytest.mark.asyncio
+async def test_notify_is_a_noop_without_redis(monkeypatch):
+    def unreachable():
+        raise AssertionError("notify must not open a Redis client without REDIS_URL")
+
+    monkeypatch.setattr(notifications, "redis_enabled", lambda: False)
+    monkeypatch.setattr(notifications, "get_async_redis", unreachable)
+    await notifications.notify("dropped")
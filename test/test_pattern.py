@@ -33,6 +33,16 @@ async def test_add_new_pattern_returns_400_if_similar_exists_and_not_forced(clie
     assert qdrant_mock.upsert.call_count == 0
 
 
+@pytest.mark.asyncio
+async def test_add_new_pattern_uses_configured_duplicate_threshold(client, qdrant_mock, monkeypatch):
+    from routers import pattern
+    monkeypatch.setattr(pattern, "DUPLICATE_SCORE_THRESHOLD", 0.95)
+    qdrant_mock.query_points.return_value = SimpleNamespace(points=[_make_point("1", 0.9, "existing_q", "existing_a")])
+    resp = await client.post("/pattern", json={"question": "q1", "answer": "a1", "force_save": False})
+    assert resp.status_code == status.HTTP_200_OK
+    assert qdrant_mock.query_points.call_args.kwargs["score_threshold"] == 0.95
+
+
 @pytest.mark.asyncio
 async def test_add_new_pattern_forced_saves_even_if_similar_exists(client, qdrant_mock):
     hit = _make_point("1", 0.9, "existing_q", "existing_a")
@@ -120,4 +130,76 @@ async def test_get_validation_error_on_missing_question_param(client):
 async def test_delete_pattern_raises_when_service_crashes(client, qdrant_mock):
     qdrant_mock.delete.side_effect = RuntimeError("boom")
     with pytest.raises(RuntimeError):
-        await client.delete("/pattern", params={"uuid": "abc"})
\ No newline at end of file
+        await client.delete("/pattern", params={"uuid": "abc"})
+
+
+@pytest.mark.asyncio
+async def test_collection_is_checked_once_and_recreated_after_404(client, qdrant_mock):
+    from qdrant_client.http.exceptions import UnexpectedResponse
+    from qdrant_service import service
+
+    service._ready_collections.clear()
+    qdrant_mock.query_points.return_value = SimpleNamespace(points=[])
+    await client.get("/pattern", params={"question": "some"})
+    await client.get("/pattern", params={"question": "other"})
+    assert qdrant_mock.get_collection.call_count == 1
+
+    not_found = UnexpectedResponse(404, "Not Found", b"", None)
+    qdrant_mock.query_points.side_effect = [not_found, SimpleNamespace(points=[])]
+    qdrant_mock.get_collection.side_effect = not_found
+    resp = await client.get("/pattern", params={"question": "again"})
+    assert resp.status_code == status.HTTP_200_OK
+    assert qdrant_mock.create_collection.called
+    assert qdrant_mock.query_points.call_count == 4
+
+
+@pytest.mark.asyncio
+async def test_search_batch_returns_results_in_input_order(client, qdrant_mock):
+    qdrant_mock.query_batch_points.return_value = [
+        SimpleNamespace(points=[_make_point("1", 0.9, "q1", "a1")]),
+        SimpleNamespace(points=[]),
+        SimpleNamespace(points=[_make_point("2", 0.8, "q2", "a2"), _make_point("3", 0.7, "q3", "a3")]),
+    ]
+    payload = {"questions": [
+        {"question": "first"},
+        {"question": "second", "limit": 1, "score_threshold": 0.95},
+        {"question": "third", "limit": 2},
+    ]}
+    resp = await client.post("/pattern/search-batch", json=payload)
+    assert resp.status_code == status.HTTP_200_OK
+    data = resp.json()
+    assert [[hit["uuid"] for hit in hits] for hits in data] == [["1"], [], ["2", "3"]]
+
+    assert qdrant_mock.query_batch_points.call_count == 1
+    requests = qdrant_mock.query_batch_points.call_args.kwargs["requests"]
+    assert [r.limit for r in requests] == [5, 1, 2]
+    assert [r.score_threshold for r in requests] == [None, 0.95, None]
+
+
+@pytest.mark.asyncio
+async def test_search_batch_rejects_too_many_questions(client, qdrant_mock):
+    from config import SEARCH_BATCH_MAX_ITEMS
+    payload = {"questions": [{"question": f"q{i}"} for i in range(SEARCH_BATCH_MAX_ITEMS + 1)]}
+    resp = await client.post("/pattern/search-batch", json=payload)
+    assert resp.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert not qdrant_mock.query_batch_points.called
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("limit", [0, -1, 101])
+async def test_search_batch_rejects_out_of_range_limits(client, qdrant_mock, limit):
+    payload = {"questions": [{"question": "q", "limit": limit}]}
+    resp = await client.post("/pattern/search-batch", json=payload)
+    assert resp.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert not qdrant_mock.query_batch_points.called
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_exposes_qdrant_latency(client, qdrant_mock):
+    qdrant_mock.query_points.return_value = SimpleNamespace(points=[])
+    await client.get("/pattern", params={"question": "some"})
+    resp = await client.get("/metrics")
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.headers["content-type"].startswith("text/plain")
+    assert 'qdrant_request_seconds_count{operation="query_points"}' in resp.text
+    assert "embedding_batch_size_bucket" in resp.text
@@ -0,0 +1,206 @@
+import asyncio
+
+import pytest
+
+from celery_app import ai_cache, proccess_chat, tasks
+
+
+def _messages(count: int):
+    senders = ["client", "staff"]
+    return [{"sender": senders[i % 2], "message_text": "x" * 400} for i in range(count)]
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    calls = {"notifications": [], "saved": [], "requests": []}
+
+    async def notify(text, key=None):
+        calls["notifications"].append(text)
+
+    monkeypatch.setattr(proccess_chat, "notify", notify)
+    monkeypatch.setattr(tasks.save_patterns, "delay", lambda patterns: calls["saved"].append(patterns))
+    return calls
+
+
+def _fake_make_request(calls, messages):
+    async def make_request(url, method='GET', data=None, **kwargs):
+        calls["requests"].append(url)
+        if url.endswith('get-unprocessed-messages'):
+            return {'status': 200, 'headers': {}, 'body': messages}
+        return {'status': 200, 'headers': {}, 'body': {}}
+    return make_request
+
+
+@pytest.mark.asyncio
+async def test_chunks_are_processed_concurrently_and_collected_in_order(monkeypatch, sent):
+    monkeypatch.setattr(proccess_chat, "AI_CONCURRENCY", 3)
+    monkeypatch.setattr(proccess_chat, "make_request", _fake_make_request(sent, _messages(40)))
+    in_flight = []
+    peak = []
+
+    async def process_using_ai(text):
+        in_flight.append(text)
+        peak.append(len(in_flight))
+        question = f"q{len(peak)}"
+        await asyncio.sleep(0.01 if len(peak) % 2 else 0.02)
+        in_flight.remove(text)
+        return [{"question": question, "answer": "a"}]
+
+    monkeypatch.setattr(proccess_chat, "process_using_ai", process_using_ai)
+    await proccess_chat.process_messages_from_chat(1)
+
+    assert max(peak) == 3
+    assert [p["question"] for p in sent["saved"][0]] == [f"q{i}" for i in range(1, len(peak) + 1)]
+    assert sent["requests"][-1] == "message/1/mark-as-processed"
+
+
+@pytest.mark.asyncio
+async def test_failed_chunk_prevents_mark_as_processed(monkeypatch, sent):
+    monkeypatch.setattr(proccess_chat, "make_request", _fake_make_request(sent, _messages(40)))
+    calls = []
+
+    async def process_using_ai(text):
+        calls.append(text)
+        if len(calls) == 2:
+            raise RuntimeError("ai is down")
+        return [{"question": "q", "answer": "a"}]
+
+    monkeypatch.setattr(proccess_chat, "process_using_ai", process_using_ai)
+    await proccess_chat.process_messages_from_chat(1)
+
+    assert len(calls) > 2
+    assert sent["saved"]
+    assert "message/1/mark-as-processed" not in sent["requests"]
+
+
+@pytest.mark.asyncio
+async def test_paginated_fetch_starts_ai_before_last_page(monkeypatch, sent):
+    messages = _messages(40)
+    events = []
+
+    async def make_request(url, method='GET', data=None, params=None, **kwargs):
+        sent["requests"].append(url)
+        if url.endswith('get-unprocessed-messages'):
+            cursor = (params or {}).get('cursor', 0)
+            events.append(f"page {cursor}")
+            await asyncio.sleep(0.01)
+            page = messages[cursor:cursor + params['limit']]
+            following = cursor + params['limit']
+            return {'status': 200, 'headers': {}, 'body': {'items': page, 'next': following if following < len(messages) else None}}
+        return {'status': 200, 'headers': {}, 'body': {}}
+
+    async def process_using_ai(text):
+        events.append("ai")
+        return []
+
+    monkeypatch.setattr(proccess_chat, "MESSAGES_PAGE_SIZE", 10)
+    monkeypatch.setattr(proccess_chat, "make_request", make_request)
+    monkeypatch.setattr(proccess_chat, "process_using_ai", process_using_ai)
+    await proccess_chat.process_messages_from_chat(1)
+
+    assert events.index("ai") < events.index("page 30")
+    assert sent["requests"][-1] == "message/1/mark-as-processed"
+
+
+def test_chunk_builder_emits_chunks_incrementally():
+    builder = proccess_chat.ChunkBuilder(chunk_size=10)
+    assert builder.add({"sender": "client", "message_text": "hello"}) is None
+    chunk = builder.add({"sender": "staff", "message_text": "hi"})
+    assert [m["message_text"] for m in chunk] == ["hello", "hi"]
+    builder.add({"sender": "staff", "message_text": "a"})
+    builder.add({"sender": "client", "message_text": "b"})
+    assert [[m["message_text"] for m in c] for c in builder.finish()] == [["a"], ["b"]]
+    assert builder.finish() == []
+
+
+def _distinct_messages(count: int):
+    return [{**m, "message_text": f"{i:03d}" + m["message_text"][3:]} for i, m in enumerate(_messages(count))]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.sets = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value
+
+    async def smembers(self, key):
+        return set(self.sets.get(key, set()))
+
+    async def delete(self, key):
+        self.sets.pop(key, None)
+        self.values.pop(key, None)
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+
+    def sadd(self, key, *members):
+        self.redis.sets.setdefault(key, set()).update(members)
+
+    def expire(self, key, ttl):
+        pass
+
+    async def execute(self):
+        pass
+
+
+@pytest.fixture
+def ai_redis(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(ai_cache, "enabled", lambda: True)
+    monkeypatch.setattr(ai_cache, "get_async_redis", lambda: fake)
+    return fake
+
+
+@pytest.mark.asyncio
+async def test_retried_chat_only_sends_remaining_chunks(monkeypatch, sent, ai_redis):
+    monkeypatch.setattr(proccess_chat, "SAVE_BATCH_SIZE", 1)
+    monkeypatch.setattr(proccess_chat, "make_request", _fake_make_request(sent, _distinct_messages(40)))
+    calls = []
+    down = {"text": None}
+
+    async def process_using_ai(text):
+        calls.append(text)
+        if len(calls) == 2:
+            down["text"] = text
+            raise RuntimeError("ai is down")
+        return [{"question": f"q{len(calls)}", "answer": "a"}]
+
+    monkeypatch.setattr(proccess_chat, "process_using_ai", process_using_ai)
+    await proccess_chat.process_messages_from_chat(1)
+    first_run = len(calls)
+    saved = len(sent["saved"])
+    assert "message/1/mark-as-processed" not in sent["requests"]
+
+    await proccess_chat.process_messages_from_chat(1)
+
+    assert calls[first_run:] == [down["text"]]
+    assert len(sent["saved"]) == saved + 1
+    assert sent["requests"][-1] == "message/1/mark-as-processed"
+    assert ai_redis.sets == {}
+
+
+@pytest.mark.asyncio
+async def test_cached_extraction_is_reused_for_unqueued_chunk(monkeypatch, sent, ai_redis):
+    monkeypatch.setattr(proccess_chat, "make_request", _fake_make_request(sent, _distinct_messages(8)))
+    calls = []
+
+    async def process_using_ai(text):
+        calls.append(text)
+        return [{"question": "q", "answer": "a"}]
+
+    monkeypatch.setattr(proccess_chat, "process_using_ai", process_using_ai)
+    await proccess_chat.process_messages_from_chat(1)
+    await proccess_chat.process_messages_from_chat(1)
+
+    assert len(calls) == len(sent["saved"][0])
+    assert sent["saved"][1] == sent["saved"][0]
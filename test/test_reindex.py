@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+import pytest_asyncio
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http.models import PointStruct
+
+from qdrant_service.collection import create_collection, resolve_alias
+from qdrant_service.reindex import reindex_collection
+
+
+class MemoryCheckpoint:
+    def __init__(self):
+        self.state = None
+        self.saved = []
+
+    def load(self):
+        return self.state
+
+    def save(self, state):
+        self.state = dict(state)
+        self.saved.append(dict(state))
+
+    def clear(self):
+        self.state = None
+
+
+class WideModel:
+    """A "new" model with a different dimension, so old and new vectors can't be confused."""
+
+    def encode(self, texts, convert_to_numpy=True, **kwargs):
+        return np.array([[1.0, float(len(t)), 0.0, 0.0, 0.0] for t in texts])
+
+    def get_sentence_embedding_dimension(self):
+        return 5
+
+
+@pytest_asyncio.fixture
+async def local_client():
+    client = AsyncQdrantClient(location=":memory:")
+    await create_collection(client, "patterns", 3)
+    await client.upsert("patterns", points=[
+        PointStruct(id=i, vector=[1.0, 0.0, 0.0], payload={"question": "q" * i, "answer": "a", "created_at": 1.0})
+        for i in range(1, 8)
+    ])
+    yield client
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_reindex_re_embeds_everything_and_swaps_the_alias(local_client):
+    checkpoint = MemoryCheckpoint()
+    target = await reindex_collection(local_client, WideModel(), "patterns", checkpoint, batch_size=3, points_per_second=0)
+
+    assert await resolve_alias(local_client, "patterns") == target
+    points, _ = await local_client.scroll("patterns", limit=100, with_vectors=True)
+    assert len(points) == 7
+    # Cosine collections store normalized vectors.
+    assert all(p.vector[1] / p.vector[0] == pytest.approx(len(p.payload["question"])) for p in points)
+    assert [s["phase"] for s in checkpoint.saved][-1] == "switch"
+    assert checkpoint.state is None
+
+
+@pytest.mark.asyncio
+async def test_reindex_resumes_from_checkpoint(local_client):
+    checkpoint = MemoryCheckpoint()
+    model = WideModel()
+    calls = []
+    encode = model.encode
+
+    def failing_encode(texts, **kwargs):
+        calls.append(len(texts))
+        if len(calls) == 2:
+            raise RuntimeError("worker lost")
+        return encode(texts, **kwargs)
+
+    model.encode = failing_encode
+    with pytest.raises(RuntimeError):
+        await reindex_collection(local_client, model, "patterns", checkpoint, batch_size=3, points_per_second=0)
+    assert checkpoint.state["done"] == 3
+
+    model.encode = encode
+    target = await reindex_collection(local_client, model, "patterns", checkpoint, batch_size=3, points_per_second=0)
+    assert target == checkpoint.saved[0]["target"]
+    assert (await local_client.count("patterns")).count == 7
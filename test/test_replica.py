@@ -0,0 +1,146 @@
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import pytest_asyncio
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http.models import PointStruct
+
+from qdrant_service import replica as replica_module
+from qdrant_service.collection import create_collection
+from qdrant_service.replica import ReplicaFull, VectorReplica, load_replica, sync_replica, get_replica
+from qdrant_service.search_cache import get_search_cache
+from qdrant_service.service import QdrantService
+from qdrant_service.types import QuestionAnswer, QuestionLimit
+
+
+class AxisModel:
+    """Encodes "q<i>" as the i-th axis of a 4-d space."""
+
+    def encode(self, texts, convert_to_numpy=True, **kwargs):
+        return np.array([np.eye(4)[int(t[1:])] for t in texts])
+
+    def get_sentence_embedding_dimension(self):
+        return 4
+
+
+def _points(vectors):
+    return [SimpleNamespace(id=i, vector=v, payload={"question": f"q{i}"}) for i, v in enumerate(vectors)]
+
+
+@pytest.fixture(autouse=True)
+def reset_replica():
+    replica_module.reset_replica()
+    yield
+    replica_module.reset_replica()
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int8"])
+def test_search_matches_brute_force_cosine(dtype):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(300, 16)).astype(np.float32)
+    replica = VectorReplica(16, dtype=dtype, capacity=4)
+    replica.upsert(_points(vectors))
+    query = rng.normal(size=16)
+
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    expected = normalized @ (query / np.linalg.norm(query))
+    found = replica.search(query, limit=5)
+    # int8 rounding may reorder near-ties further down the list.
+    top = 3 if dtype == "float32" else 1
+    assert [point_id for point_id, _, _ in found][:top] == list(np.argsort(-expected)[:top])
+    tolerance = 1e-5 if dtype == "float32" else 0.05
+    assert found[0][1] == pytest.approx(expected.max(), abs=tolerance)
+
+
+def test_delete_keeps_rows_contiguous_and_limits_are_enforced():
+    replica = VectorReplica(2, max_bytes=3 * 2 * 4)
+    replica.upsert(_points([[1, 0], [0, 1], [1, 1]]))
+    replica.delete([0, 42])
+    assert len(replica) == 2
+    assert [point_id for point_id, _, _ in replica.search([1, 0.1], limit=5)] == [2, 1]
+    assert replica.search([1, 0], limit=5, score_threshold=0.5)[0][0] == 2
+
+    replica.upsert([SimpleNamespace(id=3, vector=[1, 0], payload={})])
+    with pytest.raises(ReplicaFull):
+        replica.upsert([SimpleNamespace(id=4, vector=[1, 0], payload={})])
+
+
+def test_search_scores_outside_the_lock_and_rescores_after_a_concurrent_delete(monkeypatch):
+    replica = VectorReplica(2)
+    replica.upsert(_points([[1, 0], [0, 1], [1, 1]]))
+    top_rows = replica_module._top_rows
+    calls = []
+
+    def racing_top_rows(*args):
+        # Writers are not blocked while a search scores.
+        assert not replica._lock.locked()
+        if not calls:
+            replica.delete([0])
+        calls.append(args)
+        return top_rows(*args)
+
+    monkeypatch.setattr(replica_module, "_top_rows", racing_top_rows)
+    found = replica.search([1, 0], limit=5)
+    assert len(calls) == 2
+    assert [point_id for point_id, _, _ in found] == [2, 1]
+
+
+@pytest_asyncio.fixture
+async def local_client():
+    client = AsyncQdrantClient(location=":memory:")
+    await create_collection(client, QdrantService.COLLECTION_NAME, 4)
+    await client.upsert(QdrantService.COLLECTION_NAME, points=[
+        PointStruct(id=i, vector=list(np.eye(4)[i]), payload={"question": f"q{i}", "answer": f"a{i}", "created_at": 1.0})
+        for i in range(2)
+    ])
+    yield client
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_service_searches_the_replica_and_applies_local_and_remote_writes(local_client):
+    await load_replica(local_client, QdrantService.COLLECTION_NAME)
+    assert len(get_replica()) == 2
+
+    service = QdrantService(local_client, AxisModel())
+    hits = await service.search_similar_questions(QuestionLimit(question="q1", limit=1))
+    assert [(h.uuid, h.answer) for h in hits] == [("1", "a1")]
+
+    await service.save_question_answer_pattern(QuestionAnswer(question="q2", answer="a2"))
+    assert len(get_replica()) == 3
+
+    # A point written by another process shows up with the next incremental sync.
+    await local_client.upsert(QdrantService.COLLECTION_NAME, points=[
+        PointStruct(id=3, vector=list(np.eye(4)[3]), payload={"question": "q3", "answer": "a3", "created_at": time.time()})
+    ])
+    await sync_replica(local_client, QdrantService.COLLECTION_NAME)
+    hits = await service.search_similar_questions(QuestionLimit(question="q3", limit=1, with_payload=False))
+    assert [(h.uuid, h.answer) for h in hits] == [("3", None)]
+
+
+@pytest.mark.asyncio
+async def test_collection_over_the_memory_budget_falls_back_to_qdrant(local_client, monkeypatch):
+    monkeypatch.setattr(replica_module, "REPLICA_MAX_BYTES", 4 * 4)
+    await load_replica(local_client, QdrantService.COLLECTION_NAME)
+    assert get_replica() is None
+
+
+@pytest.mark.asyncio
+async def test_replica_answers_are_not_cached_past_a_remote_write(local_client):
+    await load_replica(local_client, QdrantService.COLLECTION_NAME)
+    service = QdrantService(local_client, AxisModel())
+    query = QuestionLimit(question="q3", limit=1)
+
+    # A worker saves a pattern and bumps the collection version; the replica has not synced yet.
+    await local_client.upsert(QdrantService.COLLECTION_NAME, points=[
+        PointStruct(id=3, vector=list(np.eye(4)[3]), payload={"question": "q3", "answer": "a3", "created_at": time.time()})
+    ])
+    await get_search_cache().bump(QdrantService.COLLECTION_NAME)
+    stale = await service.search_similar_questions(query)
+    assert [h.uuid for h in stale] != ["3"]
+
+    await sync_replica(local_client, QdrantService.COLLECTION_NAME)
+    hits = await service.search_similar_questions(query)
+    assert [(h.uuid, h.score) for h in hits] == [("3", pytest.approx(1.0))]
@@ -0,0 +1,83 @@
+import pytest
+import redis
+from types import SimpleNamespace
+
+from qdrant_service import search_cache
+from qdrant_service.search_cache import MemoryResults, RedisResults, RedisVersions, SearchCache
+from qdrant_service.types import QuestionLimit, QASearchResult
+
+
+class FakeAsyncRedis:
+    def __init__(self):
+        self.store = {}
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.store[key] = value
+
+    async def incr(self, key):
+        self.store[key] = int(self.store.get(key, 0)) + 1
+        return self.store[key]
+
+
+class BrokenRedis:
+    async def get(self, key):
+        raise redis.ConnectionError("down")
+
+    async def incr(self, key):
+        raise redis.ConnectionError("down")
+
+
+def _hit(uuid: str) -> QASearchResult:
+    return QASearchResult(question="q", answer="a", score=0.9, uuid=uuid)
+
+
+@pytest.mark.asyncio
+async def test_repeated_search_is_served_from_cache_until_a_write(client, qdrant_mock):
+    qdrant_mock.query_points.return_value = SimpleNamespace(
+        points=[SimpleNamespace(id="1", score=0.8, payload={"question": "q1", "answer": "a1"})]
+    )
+    first = await client.get("/pattern", params={"question": "How are  you?"})
+    second = await client.get("/pattern", params={"question": "how are you?"})
+    assert first.json() == second.json()
+    assert qdrant_mock.query_points.call_count == 1
+
+    await client.delete("/pattern", params={"uuid": "1"})
+    await client.get("/pattern", params={"question": "how are you?"})
+    assert qdrant_mock.query_points.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_query_parameters_are_part_of_the_key():
+    cache = SearchCache(MemoryResults(), search_cache.LocalVersions())
+    key, _ = await cache.get("c", QuestionLimit(question="q"))
+    await cache.put(key, [_hit("1")])
+    assert (await cache.get("c", QuestionLimit(question=" Q ")))[1] == [_hit("1")]
+    assert (await cache.get("c", QuestionLimit(question="q", limit=1)))[1] is None
+    assert (await cache.get("c", QuestionLimit(question="q", score_threshold=0.5)))[1] is None
+
+
+@pytest.mark.asyncio
+async def test_redis_version_bump_from_another_process_invalidates(monkeypatch):
+    fake = FakeAsyncRedis()
+    monkeypatch.setattr(search_cache, "get_async_redis", lambda: fake)
+    api = SearchCache(RedisResults(ttl=60), RedisVersions())
+    worker = SearchCache(RedisResults(ttl=60), RedisVersions())
+
+    key, _ = await api.get("c", QuestionLimit(question="q"))
+    await api.put(key, [_hit("1")])
+    assert (await api.get("c", QuestionLimit(question="q")))[1] == [_hit("1")]
+
+    await worker.bump("c")
+    assert (await api.get("c", QuestionLimit(question="q")))[1] is None
+
+
+@pytest.mark.asyncio
+async def test_unreachable_redis_bypasses_the_cache(monkeypatch):
+    monkeypatch.setattr(search_cache, "get_async_redis", lambda: BrokenRedis())
+    cache = SearchCache(MemoryResults(), RedisVersions())
+    assert await cache.get("c", QuestionLimit(question="q")) == (None, None)
+    await cache.put(None, [_hit("1")])
+    await cache.bump("c")
@@ -0,0 +1,203 @@
+import numpy as np
+import pytest
+from types import SimpleNamespace
+
+from grpc import StatusCode
+from grpc.aio import AioRpcError, Metadata
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http.exceptions import UnexpectedResponse
+
+from qdrant_service import collection, service as service_module
+from qdrant_service.collection import create_collection, switch_alias
+from qdrant_service.dedup import near_duplicate_representatives
+from qdrant_service.service import QdrantService, pattern_filter, prepare_collection
+from qdrant_service.types import QuestionAnswer, QuestionLimit, PatternFilter
+
+
+class OneHotModel:
+    """Encodes "q<i>" as the i-th unit vector, so distinct questions never look alike."""
+
+    def encode(self, texts, convert_to_numpy=True, **kwargs):
+        return [np.eye(8)[int(t[1:])] for t in texts]
+
+    def get_sentence_embedding_dimension(self):
+        return 8
+
+
+@pytest.mark.asyncio
+async def test_batch_save_skips_stored_duplicates_in_one_round_trip(qdrant_mock):
+    qdrant_mock.query_batch_points.return_value = [
+        SimpleNamespace(points=[SimpleNamespace(id="1", score=0.9)]),
+        SimpleNamespace(points=[]),
+        SimpleNamespace(points=[SimpleNamespace(id="2", score=0.5)]),
+    ]
+    service = QdrantService(qdrant_mock, OneHotModel())
+    items = [QuestionAnswer(question=f"q{i}", answer=f"a{i}") for i in range(3)]
+    result = await service.save_question_answer_patterns(items, threshold=0.68)
+
+    assert [i.question for i in result.saved] == ["q1", "q2"]
+    assert [i.question for i in result.skipped] == ["q0"]
+    assert qdrant_mock.query_batch_points.call_count == 1
+    assert len(qdrant_mock.query_batch_points.call_args.kwargs["requests"]) == 3
+    assert qdrant_mock.upsert.call_count == 1
+    points = qdrant_mock.upsert.call_args.kwargs["points"]
+    assert [p.payload["question"] for p in points] == ["q1", "q2"]
+
+
+@pytest.mark.asyncio
+async def test_batch_save_without_new_points_does_not_upsert(qdrant_mock, embedding_model):
+    qdrant_mock.query_batch_points.return_value = [SimpleNamespace(points=[SimpleNamespace(id="1", score=0.99)])]
+    service = QdrantService(qdrant_mock, embedding_model)
+    result = await service.save_question_answer_patterns([QuestionAnswer(question="q", answer="a")], threshold=0.68)
+    assert result.saved == []
+    assert qdrant_mock.upsert.call_count == 0
+
+
+def test_near_duplicates_collapse_to_first_occurrence():
+    vectors = [
+        np.array([1.0, 0.0, 0.0]),
+        np.array([0.0, 1.0, 0.0]),
+        np.array([0.99, 0.05, 0.0]),
+        np.array([0.0, 0.0, 0.0]),
+    ]
+    assert near_duplicate_representatives(vectors, threshold=0.68) == [0, 1, 3]
+    assert near_duplicate_representatives([], threshold=0.68) == []
+
+
+@pytest.mark.asyncio
+async def test_batch_save_merges_in_batch_duplicates_before_querying(qdrant_mock, embedding_model):
+    qdrant_mock.query_batch_points.return_value = [SimpleNamespace(points=[])]
+    service = QdrantService(qdrant_mock, embedding_model)
+    items = [QuestionAnswer(question="q", answer="a1"), QuestionAnswer(question="q again", answer="a2")]
+    result = await service.save_question_answer_patterns(items, threshold=0.68)
+    assert [i.answer for i in result.saved] == ["a1"]
+    assert [i.answer for i in result.merged] == ["a2"]
+    assert len(qdrant_mock.query_batch_points.call_args.kwargs["requests"]) == 1
+
+
+def test_pattern_filter_translates_only_given_fields():
+    assert pattern_filter(None) is None
+    assert pattern_filter(PatternFilter()) is None
+    query_filter = pattern_filter(PatternFilter(chat_id="7", created_from=10.0))
+    assert [c.key for c in query_filter.must] == ["chat_id", "created_at"]
+    assert query_filter.must[0].match.value == "7"
+    assert (query_filter.must[1].range.gte, query_filter.must[1].range.lt) == (10.0, None)
+
+
+@pytest.mark.asyncio
+async def test_find_duplicate_pushes_threshold_down_and_skips_payload(qdrant_mock, embedding_model):
+    qdrant_mock.query_points.return_value = SimpleNamespace(points=[SimpleNamespace(id=3, score=0.9, payload=None)])
+    service = QdrantService(qdrant_mock, embedding_model)
+    hit = await service.find_duplicate("q", 0.68, filter=PatternFilter(language="ru"))
+    assert (hit.uuid, hit.score, hit.question) == ("3", 0.9, None)
+    kwargs = qdrant_mock.query_points.call_args.kwargs
+    assert kwargs["limit"] == 1
+    assert kwargs["score_threshold"] == 0.68
+    assert kwargs["with_payload"] is False
+    assert kwargs["query_filter"].must[0].key == "language"
+
+    qdrant_mock.query_points.return_value = SimpleNamespace(points=[])
+    assert await service.find_duplicate("q", 0.68) is None
+
+
+@pytest.mark.asyncio
+async def test_saved_patterns_carry_filterable_payload(qdrant_mock, embedding_model):
+    qdrant_mock.query_batch_points.return_value = [SimpleNamespace(points=[])]
+    service = QdrantService(qdrant_mock, embedding_model)
+    await service.save_question_answer_patterns(
+        [QuestionAnswer(question="q", answer="a", chat_id="7", language="ru", created_at=5.0)], threshold=0.68
+    )
+    assert qdrant_mock.query_batch_points.call_args.kwargs["requests"][0].score_threshold == 0.68
+    payload = qdrant_mock.upsert.call_args.kwargs["points"][0].payload
+    assert payload == {"question": "q", "answer": "a", "chat_id": "7", "language": "ru", "created_at": 5.0}
+
+
+@pytest.mark.asyncio
+async def test_old_model_process_keeps_its_collection_after_a_reindex():
+    service_module._ready_collections.clear()
+    client = AsyncQdrantClient(location=":memory:")
+    name = QdrantService.COLLECTION_NAME
+    await create_collection(client, f"{name}_1", 8, service_module.EMBEDDING_MODEL_NAME)
+    await switch_alias(client, name, f"{name}_1", had_alias=False)
+    service = QdrantService(client, OneHotModel())
+    await service.save_question_answer_pattern(QuestionAnswer(question="q1", answer="a1"))
+
+    # A re-index with a same-size model switches the alias under the running process.
+    await create_collection(client, f"{name}_2", 8, "another-model")
+    await switch_alias(client, name, f"{name}_2", had_alias=True)
+    await service.save_question_answer_pattern(QuestionAnswer(question="q2", answer="a2"))
+    assert (await client.count(f"{name}_1")).count == 2
+    assert (await client.count(f"{name}_2")).count == 0
+    hits = await service.search_similar_questions(QuestionLimit(question="q2", limit=1))
+    assert hits[0].answer == "a2"
+
+    # Switching back (e.g. a rollback) unpins.
+    await switch_alias(client, name, f"{name}_1", had_alias=True)
+    await service.ensure_collection(recheck=True)
+    assert service.collection == name
+    service_module._ready_collections.clear()
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_writes_refuse_another_model_without_a_collection_to_fall_back_to():
+    service_module._ready_collections.clear()
+    client = AsyncQdrantClient(location=":memory:")
+    name = QdrantService.COLLECTION_NAME
+    await create_collection(client, f"{name}_2", 8, "another-model")
+    await switch_alias(client, name, f"{name}_2", had_alias=False)
+    service = QdrantService(client, OneHotModel())
+    with pytest.raises(RuntimeError, match="another-model"):
+        await service.save_question_answer_pattern(QuestionAnswer(question="q1", answer="a1"))
+    assert (await client.count(f"{name}_2")).count == 0
+    service_module._ready_collections.clear()
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_missing_collection_waits_for_a_pending_alias_switch(qdrant_mock, monkeypatch):
+    service_module._ready_collections.clear()
+    not_found = UnexpectedResponse(404, "Not Found", b"", None)
+    name = QdrantService.COLLECTION_NAME
+    qdrant_mock.get_collection.side_effect = [not_found, None]
+    qdrant_mock.get_collections.return_value = SimpleNamespace(collections=[SimpleNamespace(name=f"{name}_1")])
+    qdrant_mock.collection_exists.side_effect = [False, True]
+    monkeypatch.setattr(collection.asyncio, "sleep", lambda _: _noop())
+
+    await QdrantService(qdrant_mock, OneHotModel()).ensure_collection()
+    assert not qdrant_mock.create_collection.called
+    assert qdrant_mock.collection_exists.call_count == 2
+    service_module._ready_collections.clear()
+
+
+def _grpc_error(code: StatusCode) -> AioRpcError:
+    return AioRpcError(code, Metadata(), Metadata(), details=code.name)
+
+
+@pytest.mark.asyncio
+async def test_grpc_not_found_creates_the_collection_and_retries(qdrant_mock):
+    service_module._ready_collections.clear()
+    qdrant_mock.get_collection.side_effect = [_grpc_error(StatusCode.NOT_FOUND), None]
+    qdrant_mock.get_collections.return_value = SimpleNamespace(collections=[])
+    qdrant_mock.upsert.side_effect = [_grpc_error(StatusCode.NOT_FOUND), None]
+
+    await QdrantService(qdrant_mock, OneHotModel()).save_question_answer_pattern(QuestionAnswer(question="q1", answer="a1"))
+    assert qdrant_mock.create_collection.call_count == 1
+    assert qdrant_mock.upsert.call_count == 2
+    service_module._ready_collections.clear()
+
+
+@pytest.mark.asyncio
+async def test_prepare_collection_defers_when_grpc_is_unavailable(qdrant_mock):
+    service_module._ready_collections.clear()
+    qdrant_mock.get_collection.side_effect = _grpc_error(StatusCode.UNAVAILABLE)
+    await prepare_collection(qdrant_mock, OneHotModel())
+    assert QdrantService.COLLECTION_NAME not in service_module._ready_collections
+
+    qdrant_mock.get_collection.side_effect = _grpc_error(StatusCode.PERMISSION_DENIED)
+    with pytest.raises(AioRpcError):
+        await prepare_collection(qdrant_mock, OneHotModel())
+
+
+async def _noop():
+    pass
@@ -0,0 +1,56 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi import status
+
+import core.model
+
+ROOT = Path(__file__).resolve().parent.parent
+IMPORT_BUDGET_SECONDS = float(os.getenv("STARTUP_IMPORT_BUDGET", "5"))
+HEAVY_MODULES = ["torch", "sentence_transformers", "transformers", "telebot", "celery_app.tasks"]
+
+_PROFILE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+"""
+
+
+def test_api_cold_import_stays_light_and_within_budget():
+    env = {k: v for k, v in os.environ.items() if k != "TELEGRAM_BOT_TOKEN"}
+    result = subprocess.run(
+        [sys.executable, "-c", _PROFILE % HEAVY_MODULES],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    profile = json.loads(result.stdout.strip().splitlines()[-1])
+    assert profile["loaded"] == []
+    assert profile["seconds"] < IMPORT_BUDGET_SECONDS
+
+
+@pytest.mark.asyncio
+async def test_ready_reports_model_state(client, monkeypatch):
+    monkeypatch.setattr(core.model, "_state", "loading")
+    resp = await client.get("/ready")
+    assert resp.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert resp.json()["model"] == "loading"
+
+    monkeypatch.setattr(core.model, "_state", "ready")
+    resp = await client.get("/ready")
+    assert resp.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.asyncio
+async def test_start_task_is_sent_by_name(client, monkeypatch):
+    from routers import pattern
+
+    sent = []
+    monkeypatch.setattr(pattern.celery_app, "send_task", lambda name, *a, **kw: sent.append(name))
+    resp = await client.post("/pattern/start-task")
+    assert resp.status_code == status.HTTP_200_OK
+    assert sent == ["celery_app.tasks.daily_task"]
@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+
+import pytest
+
+from celery_app import celeryconfig, tasks
+
+
+def _conf():
+    return SimpleNamespace(
+        queue_worker_settings=celeryconfig.queue_worker_settings,
+        worker_concurrency=None,
+        worker_prefetch_multiplier=4,
+    )
+
+
+@pytest.mark.parametrize("task, queue", [
+    ("celery_app.tasks.process_chat", "io"),
+    ("celery_app.tasks.save_patterns", "embed"),
+    ("celery_app.tasks.flush_notification_digest", "notify"),
+])
+def test_tasks_are_routed_to_their_queue(task, queue):
+    route = tasks.celery_app.amqp.router.route({}, task)
+    assert route["queue"].name == queue
+
+
+def _start_worker(conf, options):
+    """Replay what `celery worker` does with the parsed CLI options."""
+    worker = SimpleNamespace()
+    tasks.configure_worker(conf=conf, options=dict(options), instance=worker)
+    # WorkController.setup_defaults: an explicit argument wins over conf.
+    worker.prefetch_multiplier = options["prefetch_multiplier"]
+    worker.concurrency = options["concurrency"] or conf.worker_concurrency
+    tasks.apply_queue_prefetch(sender=worker)
+    return worker
+
+
+def test_single_queue_worker_gets_queue_settings(monkeypatch):
+    monkeypatch.delenv(tasks.WORKER_QUEUES_ENV, raising=False)
+    conf = _conf()
+    # Without the flags the CLI passes concurrency=None and the default prefetch multiplier.
+    worker = _start_worker(conf, {"queues": ["embed"], "concurrency": None, "prefetch_multiplier": 4})
+    assert worker.concurrency == celeryconfig.queue_worker_settings["embed"]["concurrency"]
+    assert worker.prefetch_multiplier == celeryconfig.queue_worker_settings["embed"]["prefetch_multiplier"]
+    assert tasks.serves_embeddings()
+
+
+def test_cli_options_win_and_notify_workers_skip_the_model(monkeypatch):
+    monkeypatch.delenv(tasks.WORKER_QUEUES_ENV, raising=False)
+    conf = _conf()
+    worker = _start_worker(conf, {"queues": "notify", "concurrency": 3, "prefetch_multiplier": 2})
+    assert worker.concurrency == 3
+    assert worker.prefetch_multiplier == 2
+    assert not tasks.serves_embeddings()
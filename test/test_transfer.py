@@ -0,0 +1,84 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from qdrant_service.service import QdrantService
+from qdrant_service.transfer import import_ndjson, iter_lines
+
+
+async def _chunks(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+@pytest.mark.asyncio
+async def test_iter_lines_rejoins_lines_split_across_chunks():
+    lines = [line async for line in iter_lines(_chunks(b'{"a":', b' 1}\n{"b"', b': 2}\n{"c": 3}'))]
+    assert lines == [b'{"a": 1}', b'{"b": 2}', b'{"c": 3}']
+
+
+@pytest.mark.asyncio
+async def test_export_streams_every_scroll_page(client, qdrant_mock):
+    qdrant_mock.scroll.side_effect = [
+        ([SimpleNamespace(id="1", payload={"question": "q1"}, vector=[0.1, 0.2, 0.3])], "2"),
+        ([SimpleNamespace(id="2", payload={"question": "q2"}, vector=[0.4, 0.5, 0.6])], None),
+    ]
+    resp = await client.get("/pattern/export", params={"with_vectors": True, "batch_size": 1})
+    assert resp.status_code == 200
+    records = [json.loads(line) for line in resp.text.splitlines()]
+    assert [r["id"] for r in records] == ["1", "2"]
+    assert records[1]["vector"] == [0.4, 0.5, 0.6]
+    assert [c.kwargs["offset"] for c in qdrant_mock.scroll.call_args_list] == [None, "2"]
+    assert qdrant_mock.scroll.call_args.kwargs["with_vectors"] is True
+
+
+@pytest.mark.asyncio
+async def test_import_batches_encodes_missing_vectors_and_reports_bad_lines(qdrant_mock, embedding_model):
+    body = b"\n".join([
+        json.dumps({"id": "1", "payload": {"question": "q1", "answer": "a1"}, "vector": [1.0, 0.0, 0.0]}).encode(),
+        json.dumps({"question": "q2", "answer": "a2", "chat_id": "7"}).encode(),
+        b"not json",
+        json.dumps({"id": "3", "payload": {"question": "q3"}, "vector": [1.0]}).encode(),
+        json.dumps({"payload": {"question": "q4", "answer": "a4"}}).encode(),
+    ])
+    service = QdrantService(qdrant_mock, embedding_model)
+    reports = [r async for r in import_ndjson(service, _chunks(body), batch_size=2, parallelism=2)]
+
+    final = reports[-1]
+    assert final["done"] is True
+    assert (final["imported"], final["failed"], final["rejected"]) == (3, 0, 2)
+    assert [e["line"] for e in final["error_lines"]] == [3, 4]
+    assert qdrant_mock.upsert.call_count == 2
+    points = [p for call in qdrant_mock.upsert.call_args_list for p in call.kwargs["points"]]
+    assert [p.payload["question"] for p in points] == ["q1", "q2", "q4"]
+    assert points[0].vector == [1.0, 0.0, 0.0]
+    assert len(points[1].vector) == 3
+    assert points[1].payload["chat_id"] == "7"
+
+
+@pytest.mark.asyncio
+async def test_import_endpoint_reports_progress(client, qdrant_mock, monkeypatch):
+    from routers import pattern
+    sent = []
+
+    async def notify(text, key=None):
+        sent.append(key)
+
+    monkeypatch.setattr(pattern, "notify", notify)
+    body = "\n".join(json.dumps({"question": f"q{i}", "answer": "a"}) for i in range(3))
+    resp = await client.post("/pattern/import", content=body)
+    assert resp.status_code == 200
+    final = resp.json()
+    assert final["done"] is True
+    assert final["imported"] == 3
+    assert sent and set(sent) == {"pattern-import:progress"}
+
+
+@pytest.mark.asyncio
+async def test_import_endpoint_works_without_redis(client, qdrant_mock):
+    # conftest clears REDIS_URL, so notify() has nowhere to buffer and must stay silent.
+    body = "\n".join(json.dumps({"question": f"q{i}", "answer": "a"}) for i in range(2))
+    resp = await client.post("/pattern/import", content=body)
+    assert resp.status_code == 200
+    assert resp.json()["imported"] == 2